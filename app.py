@@ -1,27 +1,34 @@
 import os
-<<<<<<< HEAD
-import subprocess
-import tempfile
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse, HTMLResponse
-from pathlib import Path
-import uvicorn
-=======
-import uuid
 import logging
 import traceback
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request, status
-from fastapi.responses import JSONResponse, FileResponse, HTMLResponse, Response
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Query, status
+from fastapi.responses import JSONResponse, HTMLResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import uvicorn
-from rembg import new_session, remove, __version__ as rembg_version
-from PIL import Image, ImageFile
+from rembg import new_session, __version__ as rembg_version
+from PIL import Image, ImageFile, ImageOps
 import io
 import sys
->>>>>>> 8f5c616 (lets go!)
+import hashlib
+import time
+import json
+import base64
+import asyncio
+import threading
+from starlette.concurrency import run_in_threadpool
+from dataclasses import dataclass
+import numpy as np
+from compositing import composite, mask_bbox, parse_box, parse_color
+from degradation import AdaptivePolicy, Tier
+from fast_paths import FastPathClassifier
+from inference_pool import InferenceCancelled, InferencePool, check_cancelled, tier_mask
+from mask_store import MaskStore, StoredMask
+from near_duplicates import NearDuplicateIndex
+from scheduler import FairScheduler, RequestClass
+from storage import DiskJanitor, write_atomic
+from http_cache import ResultStaticFiles, cached_response, content_hash, not_modified, request_etag
 
 # Configure logging
 logging.basicConfig(
@@ -56,60 +63,309 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 # Create necessary directories
 UPLOAD_FOLDER = "uploads"
-<<<<<<< HEAD
-Path(UPLOAD_FOLDER).mkdir(exist_ok=True)
-
-# No need for static files in this simplified version
-
-def remove_background(image_path: str, output_path: str) -> bool:
-    """Remove background using rembg CLI"""
-    try:
-        result = subprocess.run(
-            ["rembg", "i", image_path, output_path],
-            capture_output=True,
-            text=True
-        )
-        if result.returncode != 0:
-            print(f"Error: {result.stderr}")
-            return False
-        return True
-    except Exception as e:
-        print(f"Error in remove_background: {str(e)}")
-        return False
-=======
 OUTPUT_FOLDER = "static/results"
 Path(UPLOAD_FOLDER).mkdir(exist_ok=True)
 Path(OUTPUT_FOLDER).mkdir(exist_ok=True, parents=True)
 
 # Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", ResultStaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
+# Requests are processed in memory; persisted results are swept by TTL and disk quota
+janitor = DiskJanitor(
+    [UPLOAD_FOLDER, OUTPUT_FOLDER],
+    ttl=float(os.environ.get("RESULT_TTL_SECONDS", 3600)),
+    max_bytes=int(os.environ.get("RESULT_QUOTA_MB", 512)) * 1024 * 1024
+)
+CLEANUP_INTERVAL = float(os.environ.get("CLEANUP_INTERVAL_SECONDS", 300))
+
+async def cleanup_loop():
+    """Periodically sweep persisted files in the background"""
+    while True:
+        try:
+            await run_in_threadpool(janitor.sweep)
+        except Exception as e:
+            logger.error(f"Storage cleanup failed: {str(e)}")
+        await asyncio.sleep(CLEANUP_INTERVAL)
+
+@app.on_event("startup")
+async def start_cleanup():
+    asyncio.get_running_loop().create_task(cleanup_loop())
+
+@app.on_event("startup")
+async def start_inference_pool():
+    # Started per server process so a preforked serve.py worker gets its own pool
+    if inference_pool:
+        await run_in_threadpool(inference_pool.start)
+
+@app.on_event("shutdown")
+async def stop_inference_pool():
+    if inference_pool:
+        inference_pool.close()
+
+# First phase of /remove-bg/progressive: small model on a small image, no matting
+PREVIEW_TIER = Tier("preview", model_name="u2netp")
+PREVIEW_MAX_SIDE = int(os.environ.get("PREVIEW_MAX_SIDE", 512))
+
+# With INFERENCE_WORKERS set, inference runs in supervised worker processes instead of here
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", 0))
+inference_pool = InferencePool(
+    workers=INFERENCE_WORKERS,
+    max_requests=int(os.environ.get("INFERENCE_WORKER_MAX_REQUESTS", 500)),
+    max_rss_mb=int(os.environ.get("INFERENCE_WORKER_MAX_RSS_MB", 2048)),
+    job_timeout=float(os.environ.get("INFERENCE_TIMEOUT_SECONDS", 300)),
+    preload_models=("u2net", PREVIEW_TIER.model_name)
+) if INFERENCE_WORKERS else None
+
 # Initialize model (load once at startup)
 try:
-    logger.info(f"Initializing U2Net model (rembg v{rembg_version})...")
-    model = new_session("u2net")
-    logger.info("Model loaded successfully")
+    if inference_pool:
+        model = preview_model = None
+        logger.info(f"Using {INFERENCE_WORKERS} isolated inference workers (rembg v{rembg_version})")
+    else:
+        logger.info(f"Initializing U2Net model (rembg v{rembg_version})...")
+        model = new_session("u2net")
+        # Previews (and the lite tier) use the small model; load it now, not on the first preview
+        preview_model = new_session(PREVIEW_TIER.model_name)
+        logger.info("Model loaded successfully")
 except Exception as e:
     logger.error(f"Failed to load model: {str(e)}")
     logger.error(traceback.format_exc())
     raise RuntimeError("Failed to initialize the AI model. Please check the logs for details.")
 
-def remove_background(image_data: bytes, output_path: Optional[str] = None) -> bytes:
-    """Remove background from image and return bytes"""
+# Predicted masks, kept so results can be recomposited without running the model again
+mask_store = MaskStore(
+    max_entries=int(os.environ.get("MASK_STORE_MAX_ENTRIES", 512)),
+    max_bytes=int(os.environ.get("MASK_STORE_MAX_MB", 256)) * 1024 * 1024
+)
+
+# Sessions for any other models are loaded on first use
+sessions = {"u2net": model, PREVIEW_TIER.model_name: preview_model} if model else {}
+sessions_lock = threading.Lock()
+
+def get_session(model_name: str):
+    """Return the session for model_name, loading it if needed"""
+    with sessions_lock:
+        if model_name not in sessions:
+            logger.info(f"Loading {model_name} model for degraded tier...")
+            sessions[model_name] = new_session(model_name)
+        return sessions[model_name]
+
+# Inference runs in the threadpool; slots are shared between request classes by weight,
+# with bulk capped so interactive requests always find a slot soon
+INFERENCE_CONCURRENCY = int(os.environ.get("INFERENCE_CONCURRENCY", INFERENCE_WORKERS or 1))
+BULK_MAX_CONCURRENCY = int(os.environ.get("BULK_MAX_CONCURRENCY", max(1, INFERENCE_CONCURRENCY - 1)))
+scheduler = FairScheduler(
+    capacity=INFERENCE_CONCURRENCY,
+    classes=[
+        RequestClass("interactive", weight=float(os.environ.get("INTERACTIVE_WEIGHT", 8))),
+        RequestClass(
+            "bulk",
+            weight=float(os.environ.get("BULK_WEIGHT", 1)),
+            max_concurrency=BULK_MAX_CONCURRENCY
+        ),
+    ]
+)
+BULK_API_KEYS = {key for key in os.environ.get("BULK_API_KEYS", "").split(",") if key}
+if BULK_API_KEYS and BULK_MAX_CONCURRENCY >= INFERENCE_CONCURRENCY:
+    logger.warning(
+        f"Bulk requests may occupy all {INFERENCE_CONCURRENCY} inference slot(s), so interactive "
+        "requests can wait behind a full bulk job; set INFERENCE_CONCURRENCY >= 2 to reserve one"
+    )
+
+def request_class(request: Request) -> str:
+    """Classify a request as interactive or bulk from its headers"""
+    if request.headers.get("X-API-Key") in BULK_API_KEYS:
+        return "bulk"
+    if request.headers.get("X-Request-Class", "").lower() == "bulk":
+        return "bulk"
+    return "interactive"
+
+# Steps down to cheaper tiers when latency exceeds the target, and back up when load drops
+policy = AdaptivePolicy(target_latency=float(os.environ.get("SLO_TARGET_MS", 4000)) / 1000)
+
+# Transparent PNGs and plain studio backgrounds get their mask without the model
+fast_paths = FastPathClassifier(
+    min_confidence=float(os.environ.get("FAST_PATH_MIN_CONFIDENCE", 0.9)),
+    enabled=os.environ.get("FAST_PATHS", "1") != "0"
+)
+
+# Full-quality masks reused for resized, recompressed or rotated copies of earlier uploads
+near_duplicates = NearDuplicateIndex(
+    max_distance=int(os.environ.get("MASK_REUSE_MAX_DISTANCE", 6)),
+    max_entries=int(os.environ.get("MASK_REUSE_MAX_ENTRIES", 2048)),
+    max_bytes=int(os.environ.get("MASK_REUSE_MAX_MB", 128)) * 1024 * 1024,
+    verify=os.environ.get("MASK_REUSE_VERIFY", "1") != "0",
+    enabled=os.environ.get("MASK_REUSE", "1") != "0"
+)
+
+# Versions everything that changes output for the same upload and options (near-duplicate
+# results depend on the index state and are validated by content instead)
+CACHE_VERSION = f"{rembg_version}:{policy.tiers[0]}:{fast_paths.enabled}:{fast_paths.min_confidence}"
+RESULT_CACHE_CONTROL = f"private, max-age={int(os.environ.get('RESULT_CACHE_MAX_AGE', 86400))}"
+
+DISCONNECT_POLL_INTERVAL = 0.25
+
+async def run_inference(traffic_class: str, func, *args) -> Tuple[Any, float]:
+    """Run func in the threadpool under a scheduler slot; returns its result and the queue wait"""
+    queue_wait = await scheduler.acquire(traffic_class)
+    future = asyncio.ensure_future(run_in_threadpool(func, *args))
+    
+    def release(done: asyncio.Future):
+        # A cancelled request can't interrupt the worker thread, so keep the slot until it finishes
+        scheduler.release(traffic_class)
+        if not done.cancelled():
+            done.exception()
+    
+    future.add_done_callback(release)
+    return await asyncio.shield(future), queue_wait
+
+async def run_cancellable(request: Request, traffic_class: str, func, *args) -> Tuple[Any, float]:
+    """
+    run_inference for work that should stop when the client goes away: func receives a
+    threading.Event as its last argument, which is set on disconnect.
+    
+    Raises:
+        InferenceCancelled: If the client disconnected first
+    """
+    cancelled = threading.Event()
+    task = asyncio.ensure_future(run_inference(traffic_class, func, *args, cancelled))
     try:
-        img = Image.open(io.BytesIO(image_data))
-        output = remove(img, session=model)
-        
-        if output_path:
-            output.save(output_path, 'PNG', optimize=True)
-        
-        img_byte_arr = io.BytesIO()
-        output.save(img_byte_arr, format='PNG')
-        return img_byte_arr.getvalue()
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise InferenceCancelled()
+    finally:
+        if not task.done():
+            # Stops a queued request at once and a running one at its next checkpoint
+            cancelled.set()
+            task.cancel()
+
+def predict_mask(img: Image.Image, tier: Tier, cancelled: Optional[threading.Event] = None) -> Image.Image:
+    """Run the model at the given tier and return the 8-bit foreground mask"""
+    if inference_pool:
+        return inference_pool.predict(img, tier, cancelled)
+    return tier_mask(img, get_session(tier.model_name), tier, cancelled)
+
+def open_upright(image_data: bytes) -> Image.Image:
+    """Decode an upload in upright orientation (rembg transposes by EXIF internally, so masks are upright)"""
+    return ImageOps.exif_transpose(Image.open(io.BytesIO(image_data)))
+
+def encode_png(image: Image.Image, output_path: Optional[str] = None) -> bytes:
+    """Encode image as PNG bytes, optionally saving a copy to output_path"""
+    img_byte_arr = io.BytesIO()
+    image.save(img_byte_arr, format='PNG')
+    data = img_byte_arr.getvalue()
+    
+    if output_path:
+        write_atomic(output_path, data)
+    return data
+
+@dataclass
+class ProcessedImage:
+    """Encoded result of remove_background and what clients need to place it"""
+    data: bytes
+    mask_id: str
+    original_size: Tuple[int, int]
+    tier: str
+    bbox: Optional[Tuple[int, int, int, int]] = None  # x, y, width, height when trimmed
+    fast_path: Optional[str] = None  # Set when the mask came from a fast path or a near duplicate, not the model
+
+def persist_result(data: bytes) -> str:
+    """Store a result under its content hash and return its URL"""
+    name = f"{content_hash(data)}.png"
+    path = Path(OUTPUT_FOLDER) / name
+    if path.exists():
+        # Same content already stored; refresh it so the cleaner keeps it
+        path.touch()
+    else:
+        write_atomic(path, data)
+    return f"/static/results/{name}"
+
+def shortcut_mask(img: Image.Image, digest: bytes) -> Optional[Tuple[Image.Image, str, Optional[str]]]:
+    """Mask, tier and fast-path kind from a fast path or a (near) duplicate of the upload with SHA-256 ``digest``, or None if the model is needed"""
+    fast = fast_paths.classify(img)
+    if fast:
+        return fast.mask, "fast-path", fast.kind
+    # Only full-quality masks are indexed, so a reused mask is reported as the full tier.
+    # A byte-identical re-upload gets exactly the mask the model produced for it, so it is
+    # an ordinary full-tier result rather than a near duplicate
+    reused = near_duplicates.lookup(img, digest)
+    if reused is not None:
+        return reused.mask, policy.tiers[0].name, None if reused.exact else "near-duplicate"
+    return None
+
+def finish_result(
+    image_data: bytes,
+    img: Image.Image,
+    mask: Image.Image,
+    tier_name: str,
+    fast_path: Optional[str],
+    output_path: Optional[str] = None,
+    trim: bool = False,
+    padding: int = 0
+) -> ProcessedImage:
+    """Store the mask and composite the cutout, optionally cropped to the foreground"""
+    mask_id = mask_store.put(image_data, mask)
+    box = mask_bbox(np.asarray(mask), padding=padding) if trim else None
+    output = composite(img, mask, crop=box)
+    bbox = (box[0], box[1], box[2] - box[0], box[3] - box[1]) if box else None
+    return ProcessedImage(
+        encode_png(output, output_path),
+        mask_id,
+        img.size,
+        tier_name,
+        bbox,
+        fast_path
+    )
+
+def remove_background(
+    image_data: bytes,
+    output_path: Optional[str] = None,
+    tier: Optional[Tier] = None,
+    trim: bool = False,
+    padding: int = 0,
+    shortcuts: bool = True,
+    cancelled: Optional[threading.Event] = None
+) -> ProcessedImage:
+    """Remove background from image, optionally cropping to the foreground"""
+    try:
+        tier = tier or policy.current()
+        img = open_upright(image_data)
+        digest = hashlib.sha256(image_data).digest()
+        shortcut = shortcut_mask(img, digest) if shortcuts else None
+        if shortcut:
+            mask, tier_name, fast_path = shortcut
+        else:
+            check_cancelled(cancelled)
+            mask, tier_name, fast_path = predict_mask(img, tier, cancelled), tier.name, None
+            if tier == policy.tiers[0]:
+                near_duplicates.add(img, mask, digest)
+        return finish_result(image_data, img, mask, tier_name, fast_path, output_path, trim, padding)
+    except InferenceCancelled:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
+
+def remove_background_shortcut(image_data: bytes, trim: bool = False, padding: int = 0) -> Optional[ProcessedImage]:
+    """The result of remove_background if it needs no model run, else None"""
+    try:
+        img = open_upright(image_data)
+        shortcut = shortcut_mask(img, hashlib.sha256(image_data).digest())
+        return finish_result(image_data, img, *shortcut, trim=trim, padding=padding) if shortcut else None
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
+
+def render_preview(image_data: bytes) -> bytes:
+    """Fast low-resolution cutout for the first phase of a progressive response"""
+    try:
+        img = open_upright(image_data)
+        img.thumbnail((PREVIEW_MAX_SIDE, PREVIEW_MAX_SIDE), Image.BILINEAR)
+        return encode_png(composite(img, predict_mask(img, PREVIEW_TIER)))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
->>>>>>> 8f5c616 (lets go!)
 
 @app.get("/health")
 async def health_check() -> Dict[str, Any]:
@@ -146,16 +402,9 @@ async def home():
             <h1 class="text-4xl font-bold text-center mb-8 text-gray-800">Background Remover</h1>
             
             <div class="bg-white rounded-lg shadow-lg p-6 mb-8">
-<<<<<<< HEAD
-                <form action="/remove-bg" method="post" enctype="multipart/form-data" class="space-y-4">
-                    <div class="dropzone p-12 text-center cursor-pointer">
-                        <input type="file" name="file" id="fileInput" class="hidden" accept="image/*" required>
-                        <div class="space-y-4">
-=======
                 <div id="dropZone" class="dropzone p-12 text-center cursor-pointer">
                     <input type="file" id="fileInput" class="hidden" accept="image/*">
                     <div class="space-y-4">
->>>>>>> 8f5c616 (lets go!)
                         <svg class="mx-auto h-16 w-16 text-gray-400" fill="none" stroke="currentColor" viewBox="0 0 24 24" xmlns="http://www.w3.org/2000/svg">
                             <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M4 16l4.586-4.586a2 2 0 012.828 0L16 16m-2-2l1.586-1.586a2 2 0 012.828 0L20 14m-6-6h.01M6 20h12a2 2 0 002-2V6a2 2 0 00-2-2H6a2 2 0 00-2 2v12a2 2 0 002 2z"></path>
                         </svg>
@@ -187,98 +436,6 @@ async def home():
                             </svg>
                             Download Image
                         </a>
-<<<<<<< HEAD
-            
-            <div id="result" class="mt-8 hidden">
-                <h2 class="text-2xl font-semibold mb-4">Result</h2>
-                <div class="bg-gray-100 p-4 rounded-lg">
-                    <img id="resultImage" src="" alt="Result" class="max-w-full h-auto rounded">
-                </div>
-                <div class="mt-4 flex justify-end">
-                    <a id="downloadBtn" href="#" class="bg-green-600 hover:bg-green-700 text-white font-bold py-2 px-4 rounded-lg transition duration-200">
-                        Download Image
-                    </a>
-                </div>
-            </div>
-        </div>
-    </div>
-
-    <script>
-        // Simple file input handling
-        const fileInput = document.getElementById('fileInput');
-        const dropZone = document.querySelector('.dropzone');
-        const result = document.getElementById('result');
-        const resultImage = document.getElementById('resultImage');
-        const downloadBtn = document.getElementById('downloadBtn');
-        
-        // Handle file selection
-        fileInput.addEventListener('change', function() {
-            const file = this.files[0];
-            if (file && file.type.match('image.*')) {
-                const reader = new FileReader();
-                reader.onload = function(e) {
-                    resultImage.src = e.target.result;
-                    result.classList.remove('hidden');
-                    
-                    // Update download link
-                    const url = URL.createObjectURL(file);
-                    downloadBtn.href = url;
-                    downloadBtn.download = 'nobg_' + file.name;
-                    
-                    // Scroll to result
-                    result.scrollIntoView({ behavior: 'smooth' });
-                }
-                reader.readAsDataURL(file);
-            }
-        });
-
-        // Handle form submission
-        const form = document.querySelector('form');
-        form.addEventListener('submit', async function(e) {
-            e.preventDefault();
-            
-            const formData = new FormData(form);
-            const submitBtn = form.querySelector('button[type="submit"]');
-            const originalBtnText = submitBtn.textContent;
-            
-            try {
-                submitBtn.disabled = true;
-                submitBtn.innerHTML = 'Processing...';
-                
-                const response = await fetch('/remove-bg', {
-                    method: 'POST',
-                    body: formData
-                });
-                
-                if (!response.ok) {
-                    const error = await response.text();
-                    throw new Error(error || 'Failed to process image');
-                }
-                
-                const blob = await response.blob();
-                const url = URL.createObjectURL(blob);
-                
-                // Show result
-                resultImage.src = url;
-                downloadBtn.href = url;
-                downloadBtn.download = 'nobg_' + fileInput.files[0].name;
-                result.classList.remove('hidden');
-                
-                // Scroll to result
-                result.scrollIntoView({ behavior: 'smooth' });
-                
-            } catch (error) {
-                alert('Error: ' + error.message);
-                console.error('Error:', error);
-            } finally {
-                submitBtn.disabled = false;
-                submitBtn.textContent = originalBtnText;
-            }
-        });
-    </script>
-</body>
-</html>
-=======
                     </div>
                 </div>
                 
@@ -310,6 +467,7 @@ async def home():
             const errorMessage = document.getElementById('errorMessage');
             
             let currentResultUrl = '';
+            let currentRequest = null;
             
             // Handle drag and drop
             ['dragenter', 'dragover', 'dragleave', 'drop'].forEach(eventName => {
@@ -372,7 +530,31 @@ async def home():
                 reader.readAsDataURL(file);
             }
             
+            async function showResult(dataUrl, file) {
+                const blob = await (await fetch(dataUrl)).blob();
+                const url = URL.createObjectURL(blob);
+                
+                // Clean up previous URL if exists
+                if (currentResultUrl) {
+                    URL.revokeObjectURL(currentResultUrl);
+                }
+                currentResultUrl = url;
+                
+                resultPreview.src = url;
+                downloadBtn.href = url;
+                downloadBtn.download = `nobg_${file.name.replace(/\.[^/.]+$/, '')}.png`;
+                downloadSection.classList.remove('hidden');
+                loading.classList.add('hidden');
+            }
+            
             async function processImage(file) {
+                // Abandon any previous request; the server stops its full-quality phase
+                if (currentRequest) {
+                    currentRequest.abort();
+                }
+                const controller = new AbortController();
+                currentRequest = controller;
+                
                 try {
                     // Show loading state
                     previewSection.classList.add('hidden');
@@ -383,9 +565,11 @@ async def home():
                     const formData = new FormData();
                     formData.append('file', file);
                     
-                    const response = await fetch('/remove-bg', {
+                    // Preview and final result arrive as Server-Sent Events
+                    const response = await fetch('/remove-bg/progressive', {
                         method: 'POST',
-                        body: formData
+                        body: formData,
+                        signal: controller.signal
                     });
                     
                     if (!response.ok) {
@@ -393,26 +577,36 @@ async def home():
                         throw new Error(error.detail || 'Failed to process image');
                     }
                     
-                    const blob = await response.blob();
-                    const url = URL.createObjectURL(blob);
-                    
-                    // Clean up previous URL if exists
-                    if (currentResultUrl) {
-                        URL.revokeObjectURL(currentResultUrl);
+                    const reader = response.body.getReader();
+                    const decoder = new TextDecoder();
+                    let buffer = '';
+                    while (true) {
+                        const { done, value } = await reader.read();
+                        if (done) break;
+                        buffer += decoder.decode(value, { stream: true });
+                        
+                        let boundary;
+                        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                            const raw = buffer.slice(0, boundary);
+                            buffer = buffer.slice(boundary + 2);
+                            const event = (raw.match(/^event: (.*)$/m) || [])[1];
+                            const data = JSON.parse((raw.match(/^data: (.*)$/m) || [])[1] || '{}');
+                            
+                            if (event === 'preview') {
+                                // Show the quick cutout while the full-quality pass runs
+                                resultPreview.src = data.image;
+                                previewSection.classList.remove('hidden');
+                            } else if (event === 'final') {
+                                previewSection.classList.remove('hidden');
+                                await showResult(data.image, file);
+                            } else if (event === 'error') {
+                                throw new Error(data.detail || 'Failed to process image');
+                            }
+                        }
                     }
-                    currentResultUrl = url;
-                    
-                    // Update UI
-                    resultPreview.src = url;
-                    downloadBtn.href = url;
-                    downloadBtn.download = `nobg_${file.name.replace(/\.[^/.]+$/, '')}.png`;
-                    
-                    // Show results
-                    previewSection.classList.remove('hidden');
-                    downloadSection.classList.remove('hidden');
-                    loading.classList.add('hidden');
                     
                 } catch (error) {
+                    if (error.name === 'AbortError') return;
                     console.error('Error:', error);
                     showError(error.message || 'An error occurred while processing the image');
                     loading.classList.add('hidden');
@@ -426,11 +620,16 @@ async def home():
         </script>
     </body>
     </html>
->>>>>>> 8f5c616 (lets go!)
     """
 
 @app.post("/remove-bg")
-async def remove_bg(file: UploadFile = File(...)):
+async def remove_bg(
+    request: Request,
+    file: UploadFile = File(...),
+    persist: bool = False,
+    trim: bool = False,
+    padding: int = Query(0, ge=0)
+):
     """Remove background from uploaded image"""
     try:
         # Validate file type
@@ -451,58 +650,48 @@ async def remove_bg(file: UploadFile = File(...)):
         
         logger.info(f"Processing image: {file.filename} ({len(contents)/1024:.1f}KB)")
         
-<<<<<<< HEAD
-        # Save uploaded file
-        input_path = os.path.join(UPLOAD_FOLDER, file.filename)
-        output_path = os.path.join(UPLOAD_FOLDER, f"nobg_{file.filename}")
-        
-        with open(input_path, "wb") as f:
-            f.write(contents)
-        
-        # Process image using rembg
-        success = remove_background(input_path, output_path)
+        # Identical uploads with identical options produce identical results, so a client
+        # that already holds this ETag can be answered without processing anything
+        etag = request_etag(contents, {"trim": trim, "padding": padding}, CACHE_VERSION)
+        cached = not_modified(request, etag, {"Cache-Control": RESULT_CACHE_CONTROL})
+        if cached is not None:
+            return cached
         
-        if not success or not os.path.exists(output_path):
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to process image"
-            )
-        
-        # Return the processed image
-        return FileResponse(
-            output_path,
-            media_type="image/png",
-            filename=f"nobg_{file.filename}"
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"An error occurred: {str(e)}"
-        )
-    finally:
-        # Clean up temporary files
-        if 'input_path' in locals() and os.path.exists(input_path):
-            os.remove(input_path)
-        # Note: output_path is returned as a FileResponse which handles its own cleanup
-
-if __name__ == "__main__":
-    # For development
-    import os
-    port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("app:app", host="0.0.0.0", port=port, reload=True)
-=======
         # Process image
         try:
-            result = remove_background(contents)
-            logger.info(f"Successfully processed image: {file.filename}")
+            traffic_class = request_class(request)
+            queued_at = time.perf_counter()
+            result, queue_wait = await run_inference(
+                traffic_class, remove_background, contents, None, None, trim, padding
+            )
+            latency = time.perf_counter() - queued_at
+            scheduler.record(traffic_class, latency)
+            if traffic_class == "interactive" and not result.fast_path:
+                # Bulk waits by design; only interactive latency should trigger degradation
+                policy.record(latency, queue_wait)
+            logger.info(f"Successfully processed image: {file.filename} (class: {traffic_class}, tier: {result.tier})")
             # Create a response with the image data
-            return Response(
-                content=result,
-                media_type="image/png",
-                headers={"Content-Disposition": f"inline; filename=nobg_{file.filename}"}
+            headers = {
+                "Content-Disposition": f"inline; filename=nobg_{file.filename}",
+                "X-Mask-Id": result.mask_id,
+                "X-Quality-Tier": result.tier,
+                "X-Original-Size": "{},{}".format(*result.original_size)
+            }
+            if result.bbox:
+                headers["X-BBox"] = "{},{},{},{}".format(*result.bbox)
+            if result.fast_path:
+                headers["X-Fast-Path"] = result.fast_path
+            if persist:
+                headers["X-Result-Url"] = await run_in_threadpool(persist_result, result.data)
+            if result.tier not in (policy.tiers[0].name, "fast-path"):
+                # Degraded output must not be reused once full quality is available again
+                headers["Cache-Control"] = "no-store"
+                return Response(content=result.data, media_type="image/png", headers=headers)
+            # A reused near-duplicate mask depends on what the index held, not just on this
+            # request, so that body is validated by its content rather than the request ETag
+            response_etag = None if result.fast_path == "near-duplicate" else etag
+            return cached_response(
+                request, result.data, "image/png", etag=response_etag, cache_control=RESULT_CACHE_CONTROL, headers=headers
             )
         except Exception as e:
             logger.error(f"Error processing image: {str(e)}")
@@ -522,7 +711,168 @@ if __name__ == "__main__":
             detail="An unexpected error occurred while processing your request"
         )
 
+def sse_event(event: str, payload: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def png_data_url(data: bytes) -> str:
+    return "data:image/png;base64," + base64.b64encode(data).decode("ascii")
+
+@app.post("/remove-bg/progressive")
+async def remove_bg_progressive(
+    request: Request,
+    file: UploadFile = File(...),
+    trim: bool = False,
+    padding: int = Query(0, ge=0)
+):
+    """
+    Stream a fast preview cutout, then the full-quality result, as Server-Sent Events.
+    
+    Events: `preview` (low-resolution PNG), then `final` (full result and its metadata),
+    or `error`. The final phase is skipped or abandoned if the client disconnects.
+    """
+    if not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image (JPEG, PNG, etc.)")
+    max_size = 10 * 1024 * 1024  # 10MB
+    contents = await file.read()
+    if len(contents) > max_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File too large. Maximum size is {max_size/1024/1024}MB"
+        )
+    traffic_class = request_class(request)
+    
+    async def events():
+        try:
+            # Fast paths and near duplicates give the final result at once, without a slot
+            result = await run_in_threadpool(remove_background_shortcut, contents, trim, padding)
+            if result is None:
+                # At a tier that already runs the preview model, a preview would cost as
+                # much as the result itself
+                if policy.current().model_name != PREVIEW_TIER.model_name:
+                    preview, _ = await run_inference(traffic_class, render_preview, contents)
+                    yield sse_event("preview", {"image": png_data_url(preview)})
+                
+                if await request.is_disconnected():
+                    logger.info(f"Client disconnected before final phase: {file.filename}")
+                    return
+                
+                queued_at = time.perf_counter()
+                result, queue_wait = await run_cancellable(
+                    request, traffic_class, remove_background, contents, None, None, trim, padding, False
+                )
+                latency = time.perf_counter() - queued_at
+                scheduler.record(traffic_class, latency)
+                if traffic_class == "interactive":
+                    policy.record(latency, queue_wait)
+            
+            yield sse_event("final", {
+                "image": png_data_url(result.data),
+                "mask_id": result.mask_id,
+                "tier": result.tier,
+                "original_size": result.original_size,
+                "bbox": result.bbox,
+                "fast_path": result.fast_path,
+            })
+        except InferenceCancelled:
+            logger.info(f"Client disconnected during final phase, abandoned: {file.filename}")
+        except HTTPException as e:
+            yield sse_event("error", {"detail": e.detail})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/metrics")
+async def metrics() -> Dict[str, Any]:
+    """Scheduler, degradation and cache statistics"""
+    return {
+        "scheduler": scheduler.stats(),
+        "degradation": policy.stats(),
+        "fast_paths": fast_paths.stats(),
+        "near_duplicates": near_duplicates.stats(),
+        "inference_pool": inference_pool.stats() if inference_pool else None,
+        "mask_store": {"entries": len(mask_store), "bytes": mask_store.nbytes},
+        "storage": janitor.stats(),
+    }
+
+def render_recomposite(
+    entry: StoredMask,
+    background_data: Optional[bytes],
+    color: Optional[Tuple[int, int, int, int]],
+    crop: Optional[str],
+    foreground_threshold: int,
+    background_threshold: int
+) -> bytes:
+    """
+    Composite a stored mask again and encode the result as PNG.
+    
+    Raises:
+        ValueError: If the crop box is invalid for the stored image
+        OSError: If the background image cannot be decoded
+    """
+    image = entry.image()
+    box = parse_box(crop, image.size) if crop else None
+    bg_image = open_upright(background_data) if background_data else None
+    output = composite(
+        image,
+        entry.mask(),
+        bg_color=color,
+        bg_image=bg_image,
+        foreground_threshold=foreground_threshold,
+        background_threshold=background_threshold,
+        crop=box
+    )
+    return encode_png(output)
+
+@app.post("/recomposite/{mask_id}")
+async def recomposite(
+    request: Request,
+    mask_id: str,
+    bg_color: Optional[str] = Query(None, description="Background colour as #rrggbb[aa] or r,g,b[,a]"),
+    crop: Optional[str] = Query(None, description="Crop box as x,y,width,height"),
+    foreground_threshold: int = Query(255, ge=1, le=255),
+    background_threshold: int = Query(0, ge=0, le=254),
+    background: Optional[UploadFile] = File(None)
+):
+    """Re-render a previous result from its stored mask without running the model"""
+    entry = mask_store.get(mask_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired mask id")
+    
+    background_data = None
+    if background is not None:
+        if not (background.content_type or '').startswith('image/'):
+            raise HTTPException(status_code=400, detail="Background must be an image (JPEG, PNG, etc.)")
+        max_size = 10 * 1024 * 1024  # 10MB
+        background_data = await background.read()
+        if len(background_data) > max_size:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Background too large. Maximum size is {max_size/1024/1024}MB"
+            )
+    
+    try:
+        color = parse_color(bg_color) if bg_color else None
+        if foreground_threshold <= background_threshold:
+            raise ValueError("foreground_threshold must be greater than background_threshold")
+        # Decoding, compositing and encoding are CPU-bound; keep them off the event loop
+        body = await run_in_threadpool(
+            render_recomposite, entry, background_data, color, crop, foreground_threshold, background_threshold
+        )
+    except (ValueError, OSError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return cached_response(
+        request,
+        body,
+        "image/png",
+        cache_control=RESULT_CACHE_CONTROL,
+        headers={"X-Mask-Id": mask_id}
+    )
+
 if __name__ == "__main__":
     # For development
     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
->>>>>>> 8f5c616 (lets go!)
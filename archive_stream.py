@@ -0,0 +1,187 @@
+"""
+Streaming archive processing for the batch CLIs.
+
+Reads a tar (optionally compressed) or zip archive from a path or stdin member by member,
+feeds images to a bounded thread pool and writes the results to an output tar stream in
+completion order, followed by a ``manifest.jsonl`` member with one status line per input
+member. Nothing is extracted to disk and at most ``max_in_flight`` images are held in
+memory at once.
+
+    tar -cf - photos/ | python bg_remover.py - > cutouts.tar
+"""
+import io
+import json
+import sys
+import tarfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import PurePosixPath
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+ARCHIVE_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz', '.zip')
+MANIFEST_NAME = 'manifest.jsonl'
+
+
+def is_archive_source(source: str) -> bool:
+    """True for '-' (stdin) and for paths that look like tar or zip archives."""
+    return source == '-' or source.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _is_image(name: str) -> bool:
+    return PurePosixPath(name).suffix.lower() in IMAGE_EXTENSIONS
+
+
+def _iter_zip(archive: zipfile.ZipFile) -> Iterator[Tuple[str, Optional[bytes]]]:
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        yield info.filename, archive.read(info) if _is_image(info.filename) else None
+
+
+def _iter_tar(archive: tarfile.TarFile) -> Iterator[Tuple[str, Optional[bytes]]]:
+    for member in archive:
+        if not member.isfile():
+            continue
+        if not _is_image(member.name):
+            yield member.name, None
+            continue
+        yield member.name, archive.extractfile(member).read()
+
+
+def iter_members(source: Union[str, BinaryIO]) -> Iterator[Tuple[str, Optional[bytes]]]:
+    """
+    Yield (member name, bytes) for each regular file; bytes is None for non-image members.
+
+    Tar input is read strictly sequentially. Zip keeps its index at the end of the file,
+    so a zip arriving on a pipe is buffered in memory first; zip files on disk are read
+    member by member.
+    """
+    if isinstance(source, str):
+        if zipfile.is_zipfile(source):
+            with zipfile.ZipFile(source) as archive:
+                yield from _iter_zip(archive)
+        else:
+            with tarfile.open(source, mode='r|*') as archive:
+                yield from _iter_tar(archive)
+        return
+
+    if source.peek(4)[:4] == b'PK\x03\x04':
+        with zipfile.ZipFile(io.BytesIO(source.read())) as archive:
+            yield from _iter_zip(archive)
+    else:
+        with tarfile.open(fileobj=source, mode='r|*') as archive:
+            yield from _iter_tar(archive)
+
+
+def default_output_name(name: str) -> str:
+    path = PurePosixPath(name)
+    return str(path.with_name(f"{path.stem}_nobg.png"))
+
+
+def _unique_name(name: str, used: Set[str]) -> str:
+    """``name``, or ``name`` with a -2, -3, ... suffix if an earlier member already took it."""
+    path = PurePosixPath(name)
+    candidate, counter = name, 1
+    while candidate in used:
+        counter += 1
+        candidate = str(path.with_name(f"{path.stem}-{counter}{path.suffix}"))
+    used.add(candidate)
+    return candidate
+
+
+def _add_member(archive: tarfile.TarFile, name: str, data: bytes) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    info.mode = 0o644
+    archive.addfile(info, io.BytesIO(data))
+
+
+def process_archive(
+    source: Union[str, BinaryIO],
+    output: BinaryIO,
+    process: Callable[[bytes], bytes],
+    workers: int = 4,
+    max_in_flight: Optional[int] = None,
+    output_name: Callable[[str], str] = default_output_name
+) -> List[Dict]:
+    """
+    Process every image in an archive and stream the results out as a tar.
+
+    Args:
+        source: Archive path, or a binary stream such as ``sys.stdin.buffer``
+        output: Binary stream the result tar is written to
+        process: Turns one input image's bytes into output PNG bytes; called from worker threads
+        workers: Number of worker threads
+        max_in_flight: Maximum images read but not yet written (default: 2 * workers)
+        output_name: Maps an input member name to its output member name. Names that
+            would collide (``a.jpg`` and ``a.png``) get a -2, -3, ... suffix in input order
+
+    Returns:
+        Manifest entries, also written to the output as ``manifest.jsonl``
+    """
+    max_in_flight = max_in_flight or 2 * workers
+    manifest: List[Dict] = []
+    in_flight: Dict[Future, Tuple[str, int, str]] = {}
+    used_names = {MANIFEST_NAME}
+
+    def timed(data: bytes) -> Tuple[bytes, float]:
+        start = time.perf_counter()
+        return process(data), time.perf_counter() - start
+
+    with tarfile.open(fileobj=output, mode='w|') as out_archive, ThreadPoolExecutor(max_workers=workers) as executor:
+        def drain(block_until: int) -> None:
+            while len(in_flight) > block_until:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, size, out_name = in_flight.pop(future)
+                    entry = {'member': name, 'bytes': size}
+                    try:
+                        result, seconds = future.result()
+                        entry.update(status='ok', output=out_name, seconds=round(seconds, 3))
+                        _add_member(out_archive, out_name, result)
+                    except Exception as e:
+                        entry.update(status='error', error=f"{type(e).__name__}: {e}")
+                    manifest.append(entry)
+
+        for name, data in iter_members(source):
+            if data is None:
+                manifest.append({'member': name, 'status': 'skipped'})
+                continue
+            drain(max_in_flight - 1)
+            # Names are assigned in input order so they do not depend on completion order
+            in_flight[executor.submit(timed, data)] = (name, len(data), _unique_name(output_name(name), used_names))
+        drain(0)
+
+        _add_member(out_archive, MANIFEST_NAME, ''.join(json.dumps(e) + '\n' for e in manifest).encode())
+
+    output.flush()
+    return manifest
+
+
+def run_cli(source: str, output: Optional[str], process: Callable[[bytes], bytes], workers: int) -> None:
+    """
+    Shared entry point for the CLIs: read ``source`` ('-' for stdin) and write the result
+    tar to ``output`` ('-' or None for stdout). Progress goes to stderr so stdout stays a
+    clean tar stream.
+    """
+    from contextlib import redirect_stdout
+
+    reader = sys.stdin.buffer if source == '-' else source
+    start_time = time.time()
+    out_stream = sys.stdout.buffer if output in (None, '-') else open(output, 'wb')
+    try:
+        # Libraries and processing code print progress; keep it out of the tar stream
+        with redirect_stdout(sys.stderr):
+            manifest = process_archive(reader, out_stream, process, workers=workers)
+    finally:
+        if out_stream is not sys.stdout.buffer:
+            out_stream.close()
+
+    counts = {}
+    for entry in manifest:
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+    summary = ', '.join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"Processed archive in {time.time() - start_time:.2f} seconds: {summary or 'no members'}", file=sys.stderr)
@@ -0,0 +1,226 @@
+"""
+Warm local daemon for the command-line tools.
+
+Holds rembg sessions in memory and serves background removal over a Unix domain socket,
+so shell-scripted workflows stop paying the model load for every image. The CLIs
+(bg_remover.py, bg_remove_reliable.py, simple_bg_remove.py) use the daemon automatically
+when it is running and fall back to in-process mode when it is not.
+
+Usage:
+    python bg_daemon.py --models u2net,u2netp &
+    python bg_remover.py input.jpg -o output.png   # now served by the daemon
+"""
+import argparse
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional, Union
+
+from PIL import Image
+
+# Options forwarded to rembg.remove; anything else in a request is ignored
+ALLOWED_OPTIONS = {
+    'alpha_matting',
+    'alpha_matting_foreground_threshold',
+    'alpha_matting_background_threshold',
+    'alpha_matting_erode_size',
+    'only_mask',
+    'post_process_mask',
+}
+
+_HEADER = struct.Struct('!I')
+
+
+def default_socket_path() -> str:
+    """$BG_REMOVER_SOCKET, else a per-user socket in $XDG_RUNTIME_DIR or the temp dir."""
+    if os.environ.get('BG_REMOVER_SOCKET'):
+        return os.environ['BG_REMOVER_SOCKET']
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'bg-remover.sock')
+    return os.path.join(tempfile.gettempdir(), f'bg-remover-{os.getuid()}.sock')
+
+
+def daemon_available(socket_path: Optional[str] = None) -> bool:
+    """True if a daemon is accepting connections on ``socket_path`` (default: default_socket_path())."""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path or default_socket_path())
+        return True
+    except (FileNotFoundError, ConnectionRefusedError):
+        return False
+    finally:
+        probe.close()
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            raise ConnectionError('Connection closed mid-message')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def send_message(sock: socket.socket, header: Dict[str, Any], payload: bytes = b'') -> None:
+    """Send a length-prefixed JSON header followed by ``payload`` (its size is in the header)."""
+    encoded = json.dumps({**header, 'size': len(payload)}).encode()
+    sock.sendall(_HEADER.pack(len(encoded)) + encoded)
+    if payload:
+        sock.sendall(payload)
+
+
+def recv_message(sock: socket.socket):
+    (length,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    header = json.loads(_recv_exact(sock, length))
+    return header, _recv_exact(sock, header.get('size', 0))
+
+
+def remove_via_daemon(
+    image: Union[bytes, Image.Image],
+    model: str = 'u2net',
+    socket_path: Optional[str] = None,
+    **options
+) -> Optional[bytes]:
+    """
+    Remove the background through the daemon.
+
+    Args:
+        image: Encoded image bytes or a PIL Image
+        model: Model the daemon should use
+        socket_path: Daemon socket (default: default_socket_path())
+        **options: rembg.remove options (alpha matting thresholds, only_mask, ...)
+
+    Returns:
+        PNG bytes, or None if no daemon is listening (the caller should run in-process)
+
+    Raises:
+        RuntimeError: If the daemon could not process the image
+    """
+    if isinstance(image, Image.Image):
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG', compress_level=1)
+        image = buffer.getvalue()
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            sock.connect(socket_path or default_socket_path())
+        except (FileNotFoundError, ConnectionRefusedError):
+            return None
+        options = {k: v for k, v in options.items() if k in ALLOWED_OPTIONS}
+        send_message(sock, {'model': model, 'options': options}, image)
+        header, payload = recv_message(sock)
+    finally:
+        sock.close()
+
+    if header.get('status') != 'ok':
+        raise RuntimeError(f"Daemon error: {header.get('error', 'unknown error')}")
+    return payload
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server: DaemonServer = self.server
+        try:
+            header, payload = recv_message(self.request)
+        except (ConnectionError, ValueError, struct.error):
+            return
+
+        try:
+            result = server.process(payload, header.get('model', 'u2net'), header.get('options') or {})
+            send_message(self.request, {'status': 'ok'}, result)
+        except Exception as e:
+            send_message(self.request, {'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, models=('u2net',)):
+        from rembg import new_session
+
+        self._new_session = new_session
+        self.sessions = {}
+        self._lock = threading.Lock()
+        for model in models:
+            start_time = time.time()
+            self.sessions[model] = new_session(model)
+            print(f"Loaded {model} in {time.time() - start_time:.2f} seconds")
+
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o600)
+
+    def session(self, model: str):
+        with self._lock:
+            if model not in self.sessions:
+                self.sessions[model] = self._new_session(model)
+            return self.sessions[model]
+
+    def process(self, image_data: bytes, model: str, options: Dict[str, Any]) -> bytes:
+        from rembg import remove
+
+        options = {k: v for k, v in options.items() if k in ALLOWED_OPTIONS}
+        with Image.open(io.BytesIO(image_data)) as img:
+            output = remove(img, session=self.session(model), **options)
+        buffer = io.BytesIO()
+        output.save(buffer, format='PNG', compress_level=1)
+        return buffer.getvalue()
+
+
+def _claim_socket(path: str) -> bool:
+    """Remove a stale socket file; return False if another daemon is already listening."""
+    if not os.path.exists(path):
+        return True
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return False
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(path)
+        return True
+    finally:
+        probe.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve background removal to the CLIs over a Unix socket')
+    parser.add_argument('--socket', default=default_socket_path(), help='Socket path (default: %(default)s)')
+    parser.add_argument('--models', default='u2net', help='Comma-separated models to preload (default: u2net)')
+    args = parser.parse_args()
+
+    if not _claim_socket(args.socket):
+        print(f"A daemon is already listening on {args.socket}")
+        sys.exit(1)
+
+    print("Loading models...")
+    server = DaemonServer(args.socket, [m for m in args.models.split(',') if m])
+
+    def shutdown(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    print(f"Listening on {args.socket}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        print("Daemon stopped")
+
+
+if __name__ == "__main__":
+    main()
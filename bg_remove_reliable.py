@@ -1,19 +1,59 @@
+import io
 import os
 import sys
 import time
+import threading
 import argparse
 from pathlib import Path
 from typing import List, Optional, Tuple
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
-from rembg import new_session, remove
 from PIL import Image
 
+from archive_stream import is_archive_source, run_cli
+from bg_daemon import remove_via_daemon
+
+# Archive mode calls one remover from several threads; load the model only once
+_session_lock = threading.Lock()
+
+# Remover owned by each process-pool worker, created once by _init_worker
+_worker_remover = None
+
 class BackgroundRemover:
-    def __init__(self, model_name: str = "u2net"):
-        """Initialize with a specific model and keep it in memory."""
-        self.session = new_session(model_name)
+    def __init__(self, model_name: str = "u2net", use_daemon: bool = True):
+        """Initialize with a specific model; it is loaded on first use unless the daemon serves it."""
+        self.model_name = model_name
+        self.use_daemon = use_daemon
+        self._session = None
+    
+    @property
+    def session(self):
+        with _session_lock:
+            if self._session is None:
+                # Imported here so daemon-backed runs never load rembg or ONNX Runtime
+                from rembg import new_session
+                self._session = new_session(self.model_name)
+        return self._session
+    
+    def _remove(self, img: Image.Image, data: Optional[bytes] = None, **kwargs) -> Image.Image:
+        """Run rembg through the warm daemon if it is running (sending the original file ``data``), in-process otherwise."""
+        if self.use_daemon:
+            result = remove_via_daemon(img if data is None else data, model=self.model_name, **kwargs)
+            if result is not None:
+                return Image.open(io.BytesIO(result))
+        from rembg import remove
+        return remove(img, session=self.session, **kwargs)
         
+    def _cutout(self, img: Image.Image, alpha_matting: bool, data: Optional[bytes] = None) -> Image.Image:
+        return self._remove(
+            img,
+            data,
+            alpha_matting=alpha_matting,
+            alpha_matting_foreground_threshold=240,
+            alpha_matting_background_threshold=10,
+            alpha_matting_erode_size=10,
+        )
+
     def process_image(
         self,
         input_path: str,
@@ -26,15 +66,9 @@ class BackgroundRemover:
             if output_path is None:
                 output_path = str(Path(input_path).with_stem(f"{Path(input_path).stem}_nobg"))
             
-            with Image.open(input_path) as img:
-                output_img = remove(
-                    img,
-                    session=self.session,
-                    alpha_matting=alpha_matting,
-                    alpha_matting_foreground_threshold=240,
-                    alpha_matting_background_threshold=10,
-                    alpha_matting_erode_size=10,
-                )
+            data = Path(input_path).read_bytes()
+            with Image.open(io.BytesIO(data)) as img:
+                output_img = self._cutout(img, alpha_matting, data)
                 
                 # Optimize PNG compression
                 output_img.save(
@@ -51,10 +85,23 @@ class BackgroundRemover:
             print(f"Error processing {input_path}: {str(e)}")
             return None
 
+    def process_bytes(self, data: bytes, alpha_matting: bool = True) -> bytes:
+        """Process an encoded image held in memory and return PNG bytes (archive mode)."""
+        with Image.open(io.BytesIO(data)) as img:
+            output_img = self._cutout(img, alpha_matting, data)
+        buffer = io.BytesIO()
+        output_img.save(buffer, 'PNG', compress_level=1)
+        return buffer.getvalue()
+
+def _init_worker(model_name: str, use_daemon: bool) -> None:
+    """Process-pool initializer: one remover (and at most one model load) per worker process."""
+    global _worker_remover
+    _worker_remover = BackgroundRemover(model_name=model_name, use_daemon=use_daemon)
+
 def process_single_file(args: Tuple) -> Optional[str]:
     """Helper function for multiprocessing."""
-    remover, input_path, output_path, quality, alpha_matting = args
-    return remover.process_image(input_path, output_path, quality, alpha_matting)
+    input_path, output_path, quality, alpha_matting = args
+    return _worker_remover.process_image(input_path, output_path, quality, alpha_matting)
 
 def process_directory(
     input_dir: str,
@@ -78,12 +125,16 @@ def process_directory(
         return []
     
     # Prepare arguments for multiprocessing
-    tasks = [(remover, str(f), str(output_dir / f.name), quality, alpha_matting) 
+    tasks = [(str(f), str(output_dir / f.name), quality, alpha_matting) 
              for f in image_files]
     
     # Process images in parallel
     results = []
-    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        initializer=_init_worker,
+        initargs=(remover.model_name, remover.use_daemon)
+    ) as executor:
         futures = [executor.submit(process_single_file, task) for task in tasks]
         
         # Show progress bar
@@ -96,8 +147,8 @@ def process_directory(
 
 def main():
     parser = argparse.ArgumentParser(description='Remove background from images with optimizations')
-    parser.add_argument('input', help='Input image path or directory')
-    parser.add_argument('output', nargs='?', help='Output image path or directory (optional)')
+    parser.add_argument('input', help="Input image path, directory, tar/zip archive, or '-' for an archive on stdin")
+    parser.add_argument('output', nargs='?', help='Output image path, directory, or tar for archive input (optional)')
     parser.add_argument('-m', '--model', default='u2net', help='Model to use (default: u2net)')
     parser.add_argument('-q', '--quality', type=int, default=95, help='Output quality (1-100, default: 95)')
     parser.add_argument('--no-alpha-matting', action='store_false', dest='alpha_matting', 
@@ -107,15 +158,20 @@ def main():
     
     args = parser.parse_args()
     
-    # Initialize the remover (model is loaded once and reused)
-    start_time = time.time()
-    print("Loading model...")
+    # Initialize the remover (model is loaded once and reused, or served by bg_daemon.py)
     remover = BackgroundRemover(model_name=args.model)
-    print(f"Model loaded in {time.time() - start_time:.2f} seconds")
     
     input_path = Path(args.input)
     
-    if input_path.is_file():
+    if is_archive_source(args.input):
+        # Stream the archive; results go to a tar on stdout unless an output path is given
+        run_cli(
+            args.input,
+            args.output,
+            lambda data: remover.process_bytes(data, alpha_matting=args.alpha_matting),
+            workers=args.workers or os.cpu_count() or 1
+        )
+    elif input_path.is_file():
         # Process single file
         if args.output:
             output_path = Path(args.output)
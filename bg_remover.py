@@ -1,28 +1,63 @@
+import io
 import os
+import threading
 from pathlib import Path
-from typing import Optional, Union, Tuple
+from typing import Optional, Union
 
-import cv2
 import numpy as np
-from PIL import Image, ImageFilter, ImageEnhance
-from rembg import remove
-from rembg.session_factory import new_session
+from PIL import Image, ImageEnhance
+
+from archive_stream import is_archive_source, run_cli
+from bg_daemon import remove_via_daemon
+from compositing import mask_bbox
+
+# Archive mode calls one remover from several threads; load the model only once
+_session_lock = threading.Lock()
 
 
 class BackgroundRemover:
-    def __init__(self, model_name: str = "u2net"):
+    def __init__(self, model_name: str = "u2net", use_daemon: bool = True):
         """
         Initialize the BackgroundRemover with a specific model.
         
         Args:
             model_name: Name of the model to use for background removal.
                        Options: 'u2net', 'u2netp', 'u2net_human_seg', etc.
+            use_daemon: Use the warm bg_daemon.py process when it is running. The model is
+                       only loaded in-process if the daemon is unavailable.
         """
         self.model_name = model_name
-        self.session = new_session(model_name)
+        self.use_daemon = use_daemon
+        self._session = None
+
+    @property
+    def session(self):
+        """rembg session, loaded on first in-process use."""
+        with _session_lock:
+            if self._session is None:
+                # Imported here so daemon-backed runs never load rembg or ONNX Runtime
+                from rembg.session_factory import new_session
+                self._session = new_session(self.model_name)
+        return self._session
+
+    def _remove(self, image: Image.Image, data: Optional[bytes] = None, **kwargs) -> Image.Image:
+        """
+        Run rembg through the daemon if it is running, in-process otherwise.
+
+        ``data`` is the encoded file ``image`` was opened from; the daemon gets it as-is,
+        which keeps EXIF orientation and skips a PNG re-encode.
+        """
+        if self.use_daemon:
+            result = remove_via_daemon(image if data is None else data, model=self.model_name, **kwargs)
+            if result is not None:
+                return Image.open(io.BytesIO(result))
+        from rembg import remove
+        return remove(image, session=self.session, **kwargs)
 
     def _refine_edges(self, image: Image.Image) -> Image.Image:
         """Refine the edges of the foreground object."""
+        import cv2
+
         # Convert to numpy array for OpenCV processing
         img_array = np.array(image)
         
@@ -73,9 +108,21 @@ class BackgroundRemover:
         r, g, b = sharpened_rgb.split()
         return Image.merge('RGBA', (r, g, b, a))
     
+    def _trim(self, image: Image.Image, padding: int = 0) -> Image.Image:
+        """Crop to the bounding box of the alpha channel, recording it in ``info``."""
+        original_size = image.size
+        box = mask_bbox(np.asarray(image.getchannel('A')), padding=padding)
+        if box is not None:
+            image = image.crop(box)
+        else:
+            box = (0, 0) + original_size
+        image.info['bbox'] = (box[0], box[1], box[2] - box[0], box[3] - box[1])
+        image.info['original_size'] = original_size
+        return image
+    
     def remove_background(
         self,
-        input_path: Union[str, Path, Image.Image],
+        input_path: Union[str, Path, bytes, Image.Image],
         output_path: Optional[Union[str, Path]] = None,
         alpha_matting: bool = True,  # Enable alpha matting by default for better edges
         alpha_matting_foreground_threshold: int = 240,
@@ -85,33 +132,41 @@ class BackgroundRemover:
         refine_edges: bool = True,   # Enable edge refinement by default
         sharpen: bool = True,        # Enable sharpening by default
         sharpen_factor: float = 1.5,  # Sharpen intensity (1.0 = no sharpening)
-        post_process: bool = True    # Enable post-processing
+        post_process: bool = True,   # Enable post-processing
+        trim: bool = False,          # Crop to the foreground bounding box
+        trim_padding: int = 0        # Transparent margin kept around the foreground when trimming
     ) -> Image.Image:
         """
         Remove background from an image.
         
         Args:
-            input_path: Path to input image or PIL Image
+            input_path: Path to input image, encoded image bytes or PIL Image
             output_path: Path to save the output image (optional)
             alpha_matting: Whether to use alpha matting
             alpha_matting_foreground_threshold: Foreground threshold for alpha matting
             alpha_matting_background_threshold: Background threshold for alpha matting
             alpha_matting_erode_size: Erode size for alpha matting
+            trim: Crop the output to the foreground bounding box
+            trim_padding: Pixels of margin to keep around the foreground when trimming
             
         Returns:
-            PIL Image with background removed
+            PIL Image with background removed. When trimming, ``info['bbox']`` holds the
+            (x, y, width, height) of the crop in the original image and
+            ``info['original_size']`` the original (width, height).
         """
-        # Load image if input is a path
+        # Load image if input is a path or file contents
+        data = None
         if isinstance(input_path, (str, Path)):
-            input_img = Image.open(input_path)
-        else:
-            input_img = input_path
+            data = Path(input_path).read_bytes()
+        elif isinstance(input_path, bytes):
+            data = input_path
+        input_img = Image.open(io.BytesIO(data)) if data is not None else input_path
 
         # Remove background with error handling for alpha matting
         try:
-            output_img = remove(
+            output_img = self._remove(
                 input_img,
-                session=self.session,
+                data,
                 alpha_matting=alpha_matting,
                 alpha_matting_foreground_threshold=alpha_matting_foreground_threshold,
                 alpha_matting_background_threshold=alpha_matting_background_threshold,
@@ -121,9 +176,9 @@ class BackgroundRemover:
         except Exception as e:
             print(f"Warning during alpha matting: {str(e)}")
             print("Retrying with alpha matting disabled...")
-            output_img = remove(
+            output_img = self._remove(
                 input_img,
-                session=self.session,
+                data,
                 alpha_matting=False
             )
         
@@ -137,6 +192,9 @@ class BackgroundRemover:
             if sharpen and sharpen_factor > 1.0:
                 output_img = self._sharpen_image(output_img, factor=sharpen_factor)
 
+        if trim:
+            output_img = self._trim(output_img, trim_padding)
+
         # Save output if path is provided
         if output_path is not None:
             output_img.save(output_path, 'PNG', compress_level=0)  # No compression for maximum quality
@@ -181,7 +239,7 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Remove background from images')
-    parser.add_argument('input', help='Input image path or directory')
+    parser.add_argument('input', help="Input image path, directory, tar/zip archive, or '-' for an archive on stdin")
     parser.add_argument('-o', '--output', help='Output image path or directory')
     parser.add_argument('--model', default='u2net', help='Model to use (default: u2net)')
     # Alpha matting arguments
@@ -196,43 +254,44 @@ def main():
     parser.add_argument('--sharpen', type=float, default=1.5, help='Sharpen factor (1.0 = no sharpening, default: 1.5)')
     parser.add_argument('--no-refine', dest='refine_edges', action='store_false', default=True, help='Disable edge refinement')
     parser.add_argument('--no-post-process', dest='post_process', action='store_false', default=True, help='Disable all post-processing')
+    parser.add_argument('--trim', action='store_true', help='Crop the output to the foreground bounding box')
+    parser.add_argument('--trim-padding', type=int, default=0, help='Margin in pixels to keep around the foreground when trimming (default: 0)')
+    parser.add_argument('--workers', type=int, default=2, help='Images processed concurrently in archive mode (default: 2)')
     
     args = parser.parse_args()
     
     remover = BackgroundRemover(model_name=args.model)
+    options = dict(
+        alpha_matting=args.alpha_matting,
+        alpha_matting_foreground_threshold=args.foreground_threshold,
+        alpha_matting_background_threshold=args.background_threshold,
+        alpha_matting_erode_size=args.erode_size,
+        alpha_matting_shift=args.matting_shift,
+        refine_edges=args.refine_edges,
+        sharpen=args.sharpen > 1.0,
+        sharpen_factor=args.sharpen,
+        post_process=args.post_process,
+        trim=args.trim,
+        trim_padding=args.trim_padding
+    )
     
-    if os.path.isfile(args.input):
+    if is_archive_source(args.input):
+        # Stream a tar/zip (or '-' for stdin) to a tar of cutouts on stdout or --output
+        def process(data: bytes) -> bytes:
+            output_img = remover.remove_background(data, **options)
+            buffer = io.BytesIO()
+            output_img.save(buffer, 'PNG', compress_level=1)
+            return buffer.getvalue()
+
+        run_cli(args.input, args.output, process, workers=args.workers)
+    elif os.path.isfile(args.input):
         # Process single file
         output_path = args.output or f"{os.path.splitext(args.input)[0]}_nobg.png"
-        remover.remove_background(
-            args.input, 
-            output_path, 
-            alpha_matting=args.alpha_matting,
-            alpha_matting_foreground_threshold=args.foreground_threshold,
-            alpha_matting_background_threshold=args.background_threshold,
-            alpha_matting_erode_size=args.erode_size,
-            alpha_matting_shift=args.matting_shift,
-            refine_edges=args.refine_edges,
-            sharpen=args.sharpen > 1.0,
-            sharpen_factor=args.sharpen,
-            post_process=args.post_process
-        )
+        remover.remove_background(args.input, output_path, **options)
     else:
         # Process directory
         output_dir = args.output or f"{args.input}_nobg"
-        remover.batch_process(
-            args.input, 
-            output_dir, 
-            alpha_matting=args.alpha_matting,
-            alpha_matting_foreground_threshold=args.foreground_threshold,
-            alpha_matting_background_threshold=args.background_threshold,
-            alpha_matting_erode_size=args.erode_size,
-            alpha_matting_shift=args.matting_shift,
-            refine_edges=args.refine_edges,
-            sharpen=args.sharpen > 1.0,
-            sharpen_factor=args.sharpen,
-            post_process=args.post_process
-        )
+        remover.batch_process(args.input, output_dir, **options)
 
 
 if __name__ == "__main__":
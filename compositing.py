@@ -0,0 +1,164 @@
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+def parse_color(value: str) -> Tuple[int, int, int, int]:
+    """
+    Parse a background colour given as hex (``#rrggbb``, ``#rrggbbaa``) or ``r,g,b[,a]``.
+
+    Raises:
+        ValueError: If the value cannot be parsed
+    """
+    value = value.strip()
+    if "," in value:
+        parts = [int(p) for p in value.split(",")]
+    else:
+        hex_value = value.lstrip("#")
+        if len(hex_value) not in (6, 8):
+            raise ValueError(f"Invalid colour: {value}")
+        parts = [int(hex_value[i:i + 2], 16) for i in range(0, len(hex_value), 2)]
+
+    if len(parts) == 3:
+        parts.append(255)
+    if len(parts) != 4 or any(p < 0 or p > 255 for p in parts):
+        raise ValueError(f"Invalid colour: {value}")
+    return tuple(parts)
+
+
+def parse_box(value: str, size: Optional[Tuple[int, int]] = None) -> Tuple[int, int, int, int]:
+    """
+    Parse a crop box given as ``x,y,width,height``.
+
+    Args:
+        value: The box to parse
+        size: Optional (width, height) of the image the box must lie within
+
+    Returns:
+        PIL-style (left, upper, right, lower) box
+
+    Raises:
+        ValueError: If the value cannot be parsed or does not fit the image
+    """
+    try:
+        x, y, w, h = (int(p) for p in value.split(","))
+    except ValueError:
+        raise ValueError(f"Invalid crop box: {value} (expected x,y,width,height)")
+    if w <= 0 or h <= 0 or x < 0 or y < 0:
+        raise ValueError(f"Invalid crop box: {value}")
+    if size is not None and (x + w > size[0] or y + h > size[1]):
+        raise ValueError(f"Invalid crop box: {value} exceeds the {size[0]}x{size[1]} image")
+    return x, y, x + w, y + h
+
+
+def apply_thresholds(
+    mask: np.ndarray,
+    foreground_threshold: int = 255,
+    background_threshold: int = 0
+) -> np.ndarray:
+    """
+    Re-level a soft mask: values at or below ``background_threshold`` become fully
+    transparent, values at or above ``foreground_threshold`` fully opaque, and the
+    band in between is stretched linearly.
+    """
+    if foreground_threshold >= 255 and background_threshold <= 0:
+        return mask
+    if foreground_threshold <= background_threshold:
+        raise ValueError("foreground_threshold must be greater than background_threshold")
+
+    scale = 255.0 / (foreground_threshold - background_threshold)
+    levelled = (mask.astype(np.float32) - background_threshold) * scale
+    return np.clip(levelled, 0, 255).astype(np.uint8)
+
+
+def _fit_background(background: Image.Image, size: Tuple[int, int]) -> np.ndarray:
+    """Scale and centre-crop ``background`` so it covers ``size``."""
+    width, height = size
+    scale = max(width / background.width, height / background.height)
+    resized = background.convert("RGB").resize(
+        (max(width, round(background.width * scale)), max(height, round(background.height * scale))),
+        Image.BILINEAR
+    )
+    left = (resized.width - width) // 2
+    top = (resized.height - height) // 2
+    return np.asarray(resized.crop((left, top, left + width, top + height)), dtype=np.float32)
+
+
+def composite(
+    image: Image.Image,
+    mask: Image.Image,
+    bg_color: Optional[Tuple[int, int, int, int]] = None,
+    bg_image: Optional[Image.Image] = None,
+    foreground_threshold: int = 255,
+    background_threshold: int = 0,
+    crop: Optional[Tuple[int, int, int, int]] = None
+) -> Image.Image:
+    """
+    Composite ``image`` over a transparent, solid or image background using ``mask``.
+
+    With no background this is rembg's naive cutout, so a stored mask reproduces
+    the original ``/remove-bg`` output. Any alpha channel in ``image`` is ignored; the
+    mask alone decides transparency.
+
+    Args:
+        image: Original image
+        mask: 8-bit mask ('L') the same size as ``image``
+        bg_color: RGBA background colour
+        bg_image: Background image, scaled to cover the output
+        foreground_threshold: Mask level treated as fully opaque
+        background_threshold: Mask level treated as fully transparent
+        crop: Optional (left, upper, right, lower) box applied before compositing
+
+    Returns:
+        RGBA PIL Image
+    """
+    if crop is not None:
+        image = image.crop(crop)
+        mask = mask.crop(crop)
+
+    alpha = apply_thresholds(np.asarray(mask.convert("L")), foreground_threshold, background_threshold)
+    alpha = alpha.astype(np.float32)[..., None] / 255.0
+    fg = np.dstack([np.asarray(image.convert("RGB"), dtype=np.float32), np.full(alpha.shape, 255.0, dtype=np.float32)])
+
+    if bg_image is not None:
+        bg = _fit_background(bg_image, image.size)
+        rgb = fg[..., :3] * alpha + bg * (1.0 - alpha)
+        out = np.dstack([rgb, fg[..., 3:]])
+    elif bg_color is not None:
+        bg = np.asarray(bg_color, dtype=np.float32)
+        out = fg * alpha + bg * (1.0 - alpha)
+    else:
+        out = fg * alpha
+
+    return Image.fromarray(np.rint(out).astype(np.uint8), "RGBA")
+
+
+def mask_bbox(
+    mask: np.ndarray,
+    padding: int = 0,
+    threshold: int = 0
+) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Bounding box of the pixels in ``mask`` above ``threshold``.
+
+    Computed from per-row and per-column reductions, so it costs two passes over the
+    8-bit mask rather than a scan of the RGBA image.
+
+    Returns:
+        PIL-style (left, upper, right, lower) box grown by ``padding`` and clamped to the
+        mask, or None if the mask is empty
+    """
+    visible = mask > threshold
+    rows = np.flatnonzero(visible.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(visible.any(axis=0))
+
+    height, width = mask.shape[:2]
+    return (
+        max(0, int(cols[0]) - padding),
+        max(0, int(rows[0]) - padding),
+        min(width, int(cols[-1]) + 1 + padding),
+        min(height, int(rows[-1]) + 1 + padding),
+    )
@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Optional, Sequence
+
+
+@dataclass(frozen=True)
+class Tier:
+    """One quality level the service can serve a request at."""
+    name: str
+    model_name: str = "u2net"
+    alpha_matting: bool = False
+    post_process_mask: bool = False
+    max_side: Optional[int] = None  # Downscale the working image so its longest side fits
+
+
+# Ordered from best quality to cheapest. The top tier is the plain U2Net cutout the
+# service has always returned; matting and mask post-processing tiers can be passed in
+# explicitly but are slower than that, so they are not part of the default ladder
+DEFAULT_TIERS = (
+    Tier("full"),
+    Tier("lite", model_name="u2netp", max_side=1024),
+)
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of ``values`` (0.0 if empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class AdaptivePolicy:
+    """
+    Picks the quality tier for new requests from recent latency and queue wait.
+
+    When the recent p95 latency exceeds the target, or requests spend a large share of
+    the target waiting for an inference slot, the policy steps down one tier. Once p95
+    is comfortably below the target and nothing is queueing it steps back up. Changes are
+    rate-limited by ``cooldown`` seconds and the window is reset after each change so the
+    next decision only sees requests served at the new tier.
+    """
+
+    def __init__(
+        self,
+        tiers: Sequence[Tier] = DEFAULT_TIERS,
+        target_latency: float = 4.0,
+        window: int = 50,
+        min_samples: int = 5,
+        queue_wait_fraction: float = 0.5,
+        recover_fraction: float = 0.6,
+        cooldown: float = 5.0
+    ):
+        """
+        Args:
+            tiers: Tiers ordered from best quality to cheapest
+            target_latency: Latency target for p95, in seconds
+            window: Number of recent requests considered
+            min_samples: Requests needed in the window before changing tier
+            queue_wait_fraction: Step down when median queue wait exceeds this share of the target
+            recover_fraction: Step up when p95 falls below this share of the target
+            cooldown: Minimum seconds between tier changes
+        """
+        self.tiers = list(tiers)
+        self.target_latency = target_latency
+        self.min_samples = min_samples
+        self.queue_wait_fraction = queue_wait_fraction
+        self.recover_fraction = recover_fraction
+        self.cooldown = cooldown
+        self._level = 0
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._waits: Deque[float] = deque(maxlen=window)
+        self._last_change = float("-inf")
+        self._lock = threading.Lock()
+
+    def current(self) -> Tier:
+        """Tier to serve the next request at."""
+        return self.tiers[self._level]
+
+    def record(self, latency: float, queue_wait: float) -> None:
+        """Record a finished request and adjust the tier if needed."""
+        with self._lock:
+            self._latencies.append(latency)
+            self._waits.append(queue_wait)
+
+            now = time.monotonic()
+            if len(self._latencies) < self.min_samples or now - self._last_change < self.cooldown:
+                return
+
+            p95 = percentile(self._latencies, 95)
+            wait = percentile(self._waits, 50)
+            if p95 > self.target_latency or wait > self.target_latency * self.queue_wait_fraction:
+                level = min(self._level + 1, len(self.tiers) - 1)
+            elif p95 < self.target_latency * self.recover_fraction and wait < self.target_latency * 0.05:
+                level = max(self._level - 1, 0)
+            else:
+                return
+
+            if level != self._level:
+                self._level = level
+                self._last_change = now
+                self._latencies.clear()
+                self._waits.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tier": self.current().name,
+                "target_latency": self.target_latency,
+                "p95_latency": percentile(self._latencies, 95),
+                "median_queue_wait": percentile(self._waits, 50),
+            }
@@ -0,0 +1,162 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+ANALYSIS_SIDE = 128
+
+
+@dataclass
+class FastPathResult:
+    """A mask produced without running the model."""
+    kind: str
+    mask: Image.Image
+    confidence: float
+
+
+def _small(image: Image.Image, mode: str) -> np.ndarray:
+    """Downsampled copy for the cheap statistics."""
+    small = image.convert(mode)
+    small.thumbnail((ANALYSIS_SIDE, ANALYSIS_SIDE), Image.BILINEAR)
+    return np.asarray(small, dtype=np.float32)
+
+
+def _border(arr: np.ndarray, width: int = 2) -> np.ndarray:
+    """Pixels within ``width`` of the image edge, flattened to (N, channels)."""
+    channels = arr.shape[2]
+    return np.concatenate([
+        arr[:width].reshape(-1, channels),
+        arr[-width:].reshape(-1, channels),
+        arr[:, :width].reshape(-1, channels),
+        arr[:, -width:].reshape(-1, channels),
+    ])
+
+
+def _connected_to_border(candidate: np.ndarray) -> np.ndarray:
+    """Pixels of boolean ``candidate`` 4-connected to the image edge (flood fill by dilation)."""
+    reached = np.zeros_like(candidate)
+    reached[0], reached[-1], reached[:, 0], reached[:, -1] = candidate[0], candidate[-1], candidate[:, 0], candidate[:, -1]
+    while True:
+        grown = reached.copy()
+        grown[1:] |= reached[:-1]
+        grown[:-1] |= reached[1:]
+        grown[:, 1:] |= reached[:, :-1]
+        grown[:, :-1] |= reached[:, 1:]
+        grown &= candidate
+        if np.array_equal(grown, reached):
+            return reached
+        reached = grown
+
+
+def existing_alpha(image: Image.Image, max_box_fill: float = 0.9) -> Optional[FastPathResult]:
+    """
+    Use the image's own alpha channel when it already separates subject and background.
+
+    The opaque region must cover at most ``max_box_fill`` of its bounding box, so a
+    photo padded or rounded with transparency still goes to the model.
+    """
+    if image.mode not in ("RGBA", "LA", "PA") and not (image.mode == "P" and "transparency" in image.info):
+        return None
+
+    small = _small(image, "RGBA")[..., 3]
+    transparent = np.mean(small < 16)
+    opaque = np.mean(small > 239)
+    if transparent < 0.02 or opaque < 0.02:
+        # Fully opaque (or fully transparent) alpha says nothing about the subject
+        return None
+
+    # Letterboxed or rounded-corner photos are transparent around a (nearly) filled
+    # rectangle; only an opaque region that leaves its bounding box visibly unfilled
+    # looks like a cut-out subject
+    rows = np.flatnonzero((small > 239).any(axis=1))
+    cols = np.flatnonzero((small > 239).any(axis=0))
+    box_area = (rows[-1] - rows[0] + 1) * (cols[-1] - cols[0] + 1)
+    if np.count_nonzero(small > 127) / box_area > max_box_fill:
+        return None
+
+    # Share of decisive (near 0 or 255) pixels; soft edges lower it slightly
+    confidence = float(transparent + opaque)
+    return FastPathResult("alpha", image.convert("RGBA").getchannel("A"), confidence)
+
+
+def uniform_background(
+    image: Image.Image,
+    border_tolerance: float = 12.0,
+    low: float = 20.0,
+    high: float = 60.0
+) -> Optional[FastPathResult]:
+    """
+    Separate a subject shot on a uniform (white or colour-key) background by colour distance.
+
+    The background colour is the median of the border pixels, which must all lie within
+    ``border_tolerance``. Pixels closer than ``low`` to it are background, farther than
+    ``high`` foreground, and the band between becomes a soft edge. Confidence drops with
+    the share of ambiguous pixels and of background-coloured regions enclosed by the
+    subject (which could be holes or parts of the product).
+    """
+    small = _small(image, "RGB")
+    border = _border(small)
+    bg_color = np.median(border, axis=0)
+    if np.percentile(np.linalg.norm(border - bg_color, axis=1), 95) > border_tolerance:
+        return None
+
+    dist = np.linalg.norm(small - bg_color, axis=2)
+    background = dist < low
+    foreground = dist > high
+    fg_share = float(np.mean(foreground))
+    if fg_share < 0.01 or fg_share > 0.95:
+        return None
+
+    ambiguous = 1.0 - fg_share - float(np.mean(background))
+    enclosed = float(np.mean(background & ~_connected_to_border(background)))
+    confidence = max(0.0, 1.0 - 10.0 * ambiguous - 20.0 * enclosed)
+
+    full = np.asarray(image.convert("RGB"), dtype=np.float32)
+    full_dist = np.linalg.norm(full - bg_color, axis=2)
+    alpha = np.clip((full_dist - low) * (255.0 / (high - low)), 0, 255).astype(np.uint8)
+    return FastPathResult("uniform-background", Image.fromarray(alpha, "L"), confidence)
+
+
+class FastPathClassifier:
+    """
+    Cheap stage in front of the model: returns a mask when simple statistics are
+    confident enough, otherwise None so the caller runs inference. Counts hits per kind.
+    """
+
+    def __init__(self, min_confidence: float = 0.9, enabled: bool = True):
+        self.min_confidence = min_confidence
+        self.enabled = enabled
+        self.hits: Dict[str, int] = {}
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def classify(self, image: Image.Image) -> Optional[FastPathResult]:
+        if not self.enabled:
+            return None
+
+        result = None
+        for detector in (existing_alpha, uniform_background):
+            candidate = detector(image)
+            if candidate is not None and candidate.confidence >= self.min_confidence:
+                result = candidate
+                break
+
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits[result.kind] = self.hits.get(result.kind, 0) + 1
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = sum(self.hits.values())
+            total = hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": dict(self.hits),
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+            }
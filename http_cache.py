@@ -0,0 +1,135 @@
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+
+# Generated results are content-addressed, so they never change once written
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def content_etag(data: bytes) -> str:
+    """Strong ETag derived from the response body."""
+    return f'"{content_hash(data)}"'
+
+
+def request_etag(image_data: bytes, params: Dict[str, Any], version: str) -> str:
+    """
+    ETag derived from the request alone: the upload, the options that affect the output
+    and the model/service version. Lets a repeat submission be answered with 304 before
+    any processing.
+    """
+    digest = hashlib.sha256(image_data)
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    digest.update(version.encode())
+    return f'"r-{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against ``etag`` (RFC 9110 13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def not_modified(request: Request, etag: str, headers: Optional[Dict[str, str]] = None) -> Optional[Response]:
+    """A 304 response if the client already holds ``etag``, else None."""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, **(headers or {})})
+    return None
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single ``bytes=`` range into an inclusive (start, end) pair.
+
+    Returns None for headers this server ignores (multiple ranges or other units).
+
+    Raises:
+        ValueError: If the range cannot be satisfied
+    """
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", header)
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(0, size - int(last))
+        end = size - 1
+    if start >= size or start > end:
+        raise ValueError(f"Unsatisfiable range: {header}")
+    return start, end
+
+
+def cached_response(
+    request: Request,
+    data: bytes,
+    media_type: str,
+    etag: Optional[str] = None,
+    cache_control: str = "private, no-cache",
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Build a response with validators, answering If-None-Match with 304 and, for GET and
+    HEAD, a single byte range with 206. Range is only defined for GET (RFC 9110 14.2), so
+    it is ignored on other methods.
+    """
+    etag = etag or content_etag(data)
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+
+    response = not_modified(request, etag, {"Cache-Control": cache_control})
+    if response is not None:
+        return response
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if request.method in ("GET", "HEAD") and range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, len(data))
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{len(data)}"})
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            return Response(content=data[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+
+    return Response(content=data, media_type=media_type, headers=headers)
+
+
+class ResultStaticFiles(StaticFiles):
+    """
+    Static files where content-addressed results (``results/<hash>.png``) get their hash
+    as ETag, immutable caching, 304s without touching the disk and byte ranges.
+    Everything else is served by StaticFiles as usual.
+    """
+
+    RESULT_PATH = re.compile(r"results/([0-9a-f]{32})\.png")
+
+    async def get_response(self, path: str, scope) -> Response:
+        match = self.RESULT_PATH.fullmatch(path.replace("\\", "/"))
+        file_path = Path(self.directory) / path if match else None
+        if file_path is None or not file_path.is_file():
+            return await super().get_response(path, scope)
+
+        request = Request(scope)
+        etag = f'"{match.group(1)}"'
+        response = not_modified(request, etag, {"Cache-Control": IMMUTABLE})
+        if response is not None:
+            return response
+
+        data = await run_in_threadpool(file_path.read_bytes)
+        return cached_response(request, data, "image/png", etag=etag, cache_control=IMMUTABLE)
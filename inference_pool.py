@@ -0,0 +1,335 @@
+"""
+Supervised pool of inference worker processes.
+
+Each worker holds its own rembg sessions, so an ONNX Runtime or pymatting crash, or
+arena growth on odd-sized inputs, is contained in a process that can be thrown away.
+Pixels and masks travel through a shared-memory segment per request; only a small job
+description goes over the worker's pipe. The supervisor replaces dead workers, retries a
+request once if its worker crashes, and recycles workers after ``max_requests`` requests
+or once their RSS exceeds ``max_rss_mb``.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.connection import wait
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional, Sequence
+
+import numpy as np
+from PIL import Image
+
+from degradation import Tier
+
+logger = logging.getLogger(__name__)
+
+# How often a pool request checks whether its caller has cancelled it
+CANCEL_POLL_INTERVAL = 0.1
+
+
+class InferenceCancelled(Exception):
+    """The caller no longer wants the result (e.g. the client disconnected)."""
+
+
+def check_cancelled(cancelled: Optional[threading.Event]) -> None:
+    if cancelled is not None and cancelled.is_set():
+        raise InferenceCancelled()
+
+
+def tier_mask(img: Image.Image, session, tier: Tier, cancelled: Optional[threading.Event] = None) -> Image.Image:
+    """
+    Run ``session`` on ``img`` at ``tier`` and return the 8-bit foreground mask.
+
+    Matting runs as a separate step after the model, so a set ``cancelled`` event stops
+    the request before its most expensive part. Only the matted alpha is kept; the
+    colours are always the original image's.
+    """
+    from rembg import remove
+    from rembg.bg import alpha_matting_cutout
+
+    work = img
+    if tier.max_side and max(img.size) > tier.max_side:
+        work = img.copy()
+        work.thumbnail((tier.max_side, tier.max_side), Image.BILINEAR)
+
+    mask = remove(work, session=session, only_mask=True, post_process_mask=tier.post_process_mask)
+    if tier.alpha_matting:
+        check_cancelled(cancelled)
+        try:
+            # Same thresholds as rembg.remove(alpha_matting=True)
+            mask = alpha_matting_cutout(work, mask, 240, 10, 10).getchannel("A")
+        except Exception as e:
+            logger.warning(f"Alpha matting failed, using plain mask: {str(e)}")
+
+    if mask.size != work.size:
+        # rembg transposes by EXIF internally; callers must pass the upright image
+        raise ValueError(f"Mask size {mask.size} does not match image size {work.size}")
+    if work is not img:
+        mask = mask.resize(img.size, Image.BILINEAR)
+    return mask
+
+
+def _worker_main(conn, preload_models: Sequence[str]) -> None:
+    """Worker loop: read (segment name, shape, tier), write the mask back into the segment."""
+    from rembg import new_session
+
+    sessions = {name: new_session(name) for name in preload_models}
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+
+        name, (height, width), tier = job
+        shm = SharedMemory(name=name)
+        try:
+            pixels = np.ndarray((height, width, 3), dtype=np.uint8, buffer=shm.buf)
+            img = Image.fromarray(pixels.copy(), "RGB")
+            del pixels
+            if tier.model_name not in sessions:
+                sessions[tier.model_name] = new_session(tier.model_name)
+
+            mask = np.asarray(tier_mask(img, sessions[tier.model_name], tier), dtype=np.uint8)
+            out = np.ndarray((height, width), dtype=np.uint8, buffer=shm.buf, offset=height * width * 3)
+            out[:] = mask
+            del out
+            conn.send(("ok", None))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+        finally:
+            shm.close()
+
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+class _Worker:
+    def __init__(self, ctx, preload_models: Sequence[str]):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, preload_models), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.requests = 0
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def run(self, job, timeout: Optional[float], cancelled: Optional[threading.Event] = None):
+        try:
+            self.conn.send(job)
+            deadline = time.monotonic() + timeout if timeout else None
+            while True:
+                step = CANCEL_POLL_INTERVAL if cancelled is not None else None
+                if deadline is not None:
+                    remaining = max(0.0, deadline - time.monotonic())
+                    step = remaining if step is None else min(step, remaining)
+                ready = wait([self.conn, self.process.sentinel], step)
+                if ready:
+                    break
+                check_cancelled(cancelled)
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise WorkerCrashed(f"worker {self.pid} timed out after {timeout}s")
+            if self.conn in ready:
+                return self.conn.recv()
+        except (EOFError, OSError):
+            pass
+        self.process.join(1.0)
+        raise WorkerCrashed(f"worker {self.pid} died with exit code {self.process.exitcode}")
+
+    def rss(self) -> Optional[int]:
+        """Resident set size in bytes (Linux only)."""
+        try:
+            with open(f"/proc/{self.pid}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def stop(self, timeout: float = 5.0) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class InferencePool:
+    """
+    Supervised worker processes computing masks for the web front end.
+
+    ``predict`` blocks and is safe to call from several threads; each call takes an idle
+    worker, so at most ``workers`` images are processed at once.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_requests: int = 500,
+        max_rss_mb: Optional[int] = 2048,
+        job_timeout: Optional[float] = 300.0,
+        preload_models: Sequence[str] = ("u2net",),
+        check_interval: float = 5.0
+    ):
+        """
+        Args:
+            workers: Number of worker processes
+            max_requests: Recycle a worker after this many requests (0 to disable)
+            max_rss_mb: Recycle a worker whose RSS exceeds this many MB (None to disable)
+            job_timeout: Seconds before a request's worker is treated as hung and replaced
+            preload_models: Models each worker loads at startup
+            check_interval: Seconds between supervisor checks on idle workers
+        """
+        self.num_workers = workers
+        self.max_requests = max_requests
+        self.max_rss = max_rss_mb * 1024 * 1024 if max_rss_mb else None
+        self.job_timeout = job_timeout
+        self.preload_models = tuple(preload_models)
+        self.check_interval = check_interval
+
+        # spawn: workers must not inherit the web process's threads or sessions
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: List[_Worker] = []
+        self._busy = 0
+        self._cond = threading.Condition()
+        self._started = False
+        self._closed = False
+        self._supervisor: Optional[threading.Thread] = None
+
+        self.crashes = 0
+        self.cancelled = 0
+        self.retries = 0
+        self.restarts = 0
+        self.recycled = 0
+
+    def start(self) -> None:
+        """Start the workers and supervisor (idempotent; called on first use)."""
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+            self._idle = [_Worker(self._ctx, self.preload_models) for _ in range(self.num_workers)]
+            logger.info(f"Started {self.num_workers} inference workers: {[w.pid for w in self._idle]}")
+        self._supervisor = threading.Thread(target=self._supervise, name="inference-supervisor", daemon=True)
+        self._supervisor.start()
+
+    def _supervise(self) -> None:
+        while True:
+            with self._cond:
+                if self._cond.wait_for(lambda: self._closed, timeout=self.check_interval):
+                    return
+                for i, worker in enumerate(self._idle):
+                    if not worker.is_alive():
+                        logger.warning(f"Idle worker {worker.pid} exited with code {worker.process.exitcode}, restarting")
+                        self._idle[i] = _Worker(self._ctx, self.preload_models)
+                        self.restarts += 1
+
+    def _checkout(self) -> _Worker:
+        with self._cond:
+            self._cond.wait_for(lambda: self._idle or self._closed)
+            if self._closed:
+                raise RuntimeError("Inference pool is closed")
+            self._busy += 1
+            return self._idle.pop()
+
+    def _checkin(self, worker: _Worker) -> None:
+        worker.requests += 1
+        rss = worker.rss()
+        if (self.max_requests and worker.requests >= self.max_requests) or (self.max_rss and rss and rss > self.max_rss):
+            logger.info(
+                f"Recycling worker {worker.pid} after {worker.requests} requests "
+                f"(RSS {(rss or 0) / 1024 / 1024:.0f}MB)"
+            )
+            worker.stop()
+            worker = _Worker(self._ctx, self.preload_models)
+            self.recycled += 1
+        with self._cond:
+            self._busy -= 1
+            self._idle.append(worker)
+            self._cond.notify()
+
+    def _replace(self, worker: _Worker) -> None:
+        """Kill a crashed, hung or cancelled worker and put a fresh one in its place."""
+        worker.stop(timeout=0)
+        self.restarts += 1
+        with self._cond:
+            self._busy -= 1
+            self._idle.append(_Worker(self._ctx, self.preload_models))
+            self._cond.notify()
+
+    def predict(self, img: Image.Image, tier: Tier, cancelled: Optional[threading.Event] = None) -> Image.Image:
+        """
+        Compute the mask for ``img`` at ``tier`` in a worker process.
+
+        Setting ``cancelled`` abandons the request: the worker is killed and replaced, and
+        InferenceCancelled is raised.
+        """
+        check_cancelled(cancelled)
+        self.start()
+        pixels = np.asarray(img.convert("RGB"), dtype=np.uint8)
+        height, width = pixels.shape[:2]
+        shm = SharedMemory(create=True, size=height * width * 4)
+        try:
+            buffer = np.ndarray((height, width, 3), dtype=np.uint8, buffer=shm.buf)
+            buffer[:] = pixels
+            del buffer
+
+            for attempt in (1, 2):
+                worker = self._checkout()
+                try:
+                    status, detail = worker.run((shm.name, (height, width), tier), self.job_timeout, cancelled)
+                except InferenceCancelled:
+                    self._replace(worker)
+                    self.cancelled += 1
+                    raise
+                except WorkerCrashed as e:
+                    self._replace(worker)
+                    self.crashes += 1
+                    if attempt == 2:
+                        raise RuntimeError(f"Inference failed twice: {e}")
+                    logger.warning(f"Inference {e}; retrying once on a fresh worker")
+                    self.retries += 1
+                    continue
+
+                self._checkin(worker)
+                if status != "ok":
+                    raise RuntimeError(detail)
+                mask = np.ndarray((height, width), dtype=np.uint8, buffer=shm.buf, offset=height * width * 3).copy()
+                return Image.fromarray(mask, "L")
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            workers, self._idle = self._idle, []
+            self._cond.notify_all()
+        for worker in workers:
+            worker.stop()
+
+    def stats(self) -> dict:
+        with self._cond:
+            idle = list(self._idle)
+            busy = self._busy
+        return {
+            "workers": self.num_workers,
+            "idle": len(idle),
+            "busy": busy,
+            "idle_rss_bytes": {w.pid: w.rss() for w in idle},
+            "crashes": self.crashes,
+            "cancelled": self.cancelled,
+            "retries": self.retries,
+            "restarts": self.restarts,
+            "recycled": self.recycled,
+        }
@@ -0,0 +1,73 @@
+import io
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+
+@dataclass
+class StoredMask:
+    """Original upload and its predicted mask, both kept compressed."""
+    image_data: bytes
+    mask_png: bytes
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.image_data) + len(self.mask_png)
+
+    def image(self) -> Image.Image:
+        """The upload in upright orientation, matching the mask."""
+        return ImageOps.exif_transpose(Image.open(io.BytesIO(self.image_data)))
+
+    def mask(self) -> Image.Image:
+        return Image.open(io.BytesIO(self.mask_png))
+
+
+class MaskStore:
+    """
+    Bounded in-memory store of predicted masks, keyed by an opaque id.
+
+    Masks are kept as 8-bit PNGs next to the original upload bytes, so a result can be
+    recomposited (new background, crop or thresholds) without running the model again.
+    The least recently used entries are evicted once either limit is exceeded.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, StoredMask]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, image_data: bytes, mask: Image.Image) -> str:
+        """Store ``mask`` for ``image_data`` and return its id."""
+        buffer = io.BytesIO()
+        mask.convert("L").save(buffer, format="PNG", compress_level=1)
+        entry = StoredMask(image_data=image_data, mask_png=buffer.getvalue())
+        mask_id = uuid.uuid4().hex
+
+        with self._lock:
+            self._entries[mask_id] = entry
+            self._bytes += entry.nbytes
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+        return mask_id
+
+    def get(self, mask_id: str) -> Optional[StoredMask]:
+        """Return the entry for ``mask_id``, or None if unknown or evicted."""
+        with self._lock:
+            entry = self._entries.get(mask_id)
+            if entry is not None:
+                self._entries.move_to_end(mask_id)
+            return entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
@@ -0,0 +1,213 @@
+"""
+Mask reuse for near-duplicate uploads.
+
+The same product photo keeps arriving resized, recompressed or with a different EXIF
+orientation, which an exact byte hash never matches. Each full-quality mask is indexed
+under a perceptual hash (DCT pHash) of the upright image; a later upload within a small
+Hamming distance gets that mask rescaled to its own size instead of another model run.
+Byte-identical re-uploads are recognised by their SHA-256 first and get the mask as is.
+"""
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+HASH_SIDE = 32
+HASH_BITS_SIDE = 8
+CHECK_SIDE = 32
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    return np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n))
+
+
+_DCT = _dct_matrix(HASH_SIDE)
+
+
+def phash(image: Image.Image) -> int:
+    """64-bit DCT perceptual hash: low frequencies of a 32x32 grayscale thumbnail vs their median."""
+    small = np.asarray(image.convert("L").resize((HASH_SIDE, HASH_SIDE), Image.BILINEAR), dtype=np.float64)
+    low = (_DCT @ small @ _DCT.T)[:HASH_BITS_SIDE, :HASH_BITS_SIDE].flatten()
+    # The DC term only reflects overall brightness, so leave it out of the median
+    bits = low > np.median(low[1:])
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _check_thumbnail(image: Image.Image) -> np.ndarray:
+    """Zero-mean, unit-variance grayscale thumbnail for the consistency check."""
+    small = np.asarray(image.convert("L").resize((CHECK_SIDE, CHECK_SIDE), Image.BILINEAR), dtype=np.float32)
+    small = small - small.mean()
+    return small / (small.std() or 1.0)
+
+
+@dataclass
+class ReusedMask:
+    """A stored mask returned for a new upload."""
+    mask: Image.Image
+    exact: bool  # The upload is byte-identical to the one the mask was predicted for
+
+
+@dataclass
+class _Entry:
+    hash: int
+    aspect: float
+    thumbnail: np.ndarray
+    mask_png: bytes
+    digest: Optional[bytes] = None
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.mask_png) + self.thumbnail.nbytes
+
+
+class NearDuplicateIndex:
+    """
+    Bounded LRU index of masks searchable by perceptual-hash Hamming distance.
+
+    Images and masks are expected upright (``ImageOps.exif_transpose`` already applied,
+    as the app does on upload); masks are stored as 8-bit PNGs. A candidate must
+    also have the same aspect ratio and, when ``verify`` is set, its thumbnail must
+    correlate with the stored one; this rejects crops and different shots whose hashes
+    happen to collide.
+    """
+
+    def __init__(
+        self,
+        max_distance: int = 6,
+        max_entries: int = 2048,
+        max_bytes: int = 128 * 1024 * 1024,
+        verify: bool = True,
+        min_correlation: float = 0.9,
+        aspect_tolerance: float = 0.02,
+        enabled: bool = True
+    ):
+        """
+        Args:
+            max_distance: Largest Hamming distance (of 64 bits) treated as the same image
+            max_entries: Maximum number of indexed masks
+            max_bytes: Maximum memory held by indexed masks and thumbnails
+            verify: Run the thumbnail correlation check before reusing a mask
+            min_correlation: Minimum thumbnail correlation for ``verify``
+            aspect_tolerance: Maximum relative difference in aspect ratio
+            enabled: Set to False to turn lookups and inserts into no-ops
+        """
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.verify = verify
+        self.min_correlation = min_correlation
+        self.aspect_tolerance = aspect_tolerance
+        self.enabled = enabled
+
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._by_digest: Dict[bytes, int] = {}
+        self._bytes = 0
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def add(self, image: Image.Image, mask: Image.Image, digest: Optional[bytes] = None) -> None:
+        """Index ``mask``, predicted for the upright ``image``; ``digest`` is the SHA-256 of the upload."""
+        if not self.enabled:
+            return
+        buffer = io.BytesIO()
+        mask.convert("L").save(buffer, format="PNG", compress_level=1)
+        entry = _Entry(phash(image), image.width / image.height, _check_thumbnail(image), buffer.getvalue(), digest)
+
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            if digest is not None:
+                previous = self._by_digest.get(digest)
+                if previous is not None:
+                    self._bytes -= self._entries.pop(previous).nbytes
+                self._by_digest[digest] = key
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                if evicted.digest is not None and self._by_digest.get(evicted.digest) == evicted_key:
+                    del self._by_digest[evicted.digest]
+
+    def lookup(self, image: Image.Image, digest: Optional[bytes] = None) -> Optional[ReusedMask]:
+        """
+        Find a stored mask for the upright ``image``.
+
+        Args:
+            image: Upright upload
+            digest: SHA-256 of the encoded upload; a byte-identical upload matches exactly
+
+        Returns:
+            The mask rescaled to ``image``, or None if no duplicate is indexed
+        """
+        if not self.enabled:
+            return None
+
+        if digest is not None:
+            with self._lock:
+                key = self._by_digest.get(digest)
+                if key is not None:
+                    self.exact_hits += 1
+                    self._entries.move_to_end(key)
+                    mask_png = self._entries[key].mask_png
+            if key is not None:
+                return ReusedMask(Image.open(io.BytesIO(mask_png)).resize(image.size, Image.BILINEAR), exact=True)
+
+        query = phash(image)
+        aspect = image.width / image.height
+
+        with self._lock:
+            candidates = sorted(
+                (distance, key) for key, distance in
+                ((key, hamming(query, entry.hash)) for key, entry in self._entries.items())
+                if distance <= self.max_distance
+            )
+            candidates = [(key, self._entries[key]) for _, key in candidates]
+
+        match = None
+        for key, entry in candidates:
+            if abs(entry.aspect - aspect) > self.aspect_tolerance * aspect:
+                continue
+            if self.verify and float(np.mean(entry.thumbnail * _check_thumbnail(image))) < self.min_correlation:
+                continue
+            match = (key, entry)
+            break
+
+        with self._lock:
+            if match is None:
+                self.misses += 1
+                if candidates:
+                    self.rejected += 1
+                return None
+            self.hits += 1
+            if match[0] in self._entries:
+                self._entries.move_to_end(match[0])
+
+        return ReusedMask(Image.open(io.BytesIO(match[1].mask_png)).resize(image.size, Image.BILINEAR), exact=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.exact_hits + self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "exact_hits": self.exact_hits,
+                "hits": self.hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+                "hit_rate": (self.exact_hits + self.hits) / total if total else 0.0,
+            }
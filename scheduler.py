@@ -0,0 +1,144 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque, Dict, Optional, Sequence
+
+from degradation import percentile
+
+
+@dataclass(frozen=True)
+class RequestClass:
+    """A traffic class with its share of capacity."""
+    name: str
+    weight: float = 1.0
+    max_concurrency: Optional[int] = None  # None: may use all slots
+
+
+class _ClassState:
+    def __init__(self, spec: RequestClass, window: int):
+        self.spec = spec
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.running = 0
+        self.vtime = 0.0
+        self.served = 0
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.waits: Deque[float] = deque(maxlen=window)
+
+    def can_run(self) -> bool:
+        cap = self.spec.max_concurrency
+        return cap is None or self.running < cap
+
+
+class FairScheduler:
+    """
+    Weighted fair scheduling of inference slots between request classes.
+
+    Each class has its own FIFO queue. When a slot frees up it goes to the eligible class
+    (queued work and below its concurrency cap) with the lowest virtual time; a class's
+    virtual time advances by ``1 / weight`` per dispatch, so under contention classes get
+    slots in proportion to their weights, while an idle system lets any class use every
+    slot it is allowed.
+    """
+
+    def __init__(self, capacity: int, classes: Sequence[RequestClass], window: int = 200):
+        self.capacity = capacity
+        self.running = 0
+        self._classes: Dict[str, _ClassState] = {c.name: _ClassState(c, window) for c in classes}
+
+    def _pick(self) -> Optional[_ClassState]:
+        eligible = [s for s in self._classes.values() if s.waiters and s.can_run()]
+        return min(eligible, key=lambda s: s.vtime) if eligible else None
+
+    def _grant(self, state: _ClassState) -> None:
+        self.running += 1
+        state.running += 1
+        state.vtime += 1.0 / state.spec.weight
+
+    def _dispatch(self) -> None:
+        while self.running < self.capacity:
+            state = self._pick()
+            if state is None:
+                return
+            waiter = state.waiters.popleft()
+            if waiter.done():
+                continue
+            self._grant(state)
+            waiter.set_result(None)
+
+    def _release(self, state: _ClassState) -> None:
+        self.running -= 1
+        state.running -= 1
+        self._dispatch()
+
+    async def acquire(self, name: str) -> float:
+        """Wait for a slot for class ``name`` and return the time spent queued."""
+        state = self._classes[name]
+        queued_at = time.perf_counter()
+
+        if not state.waiters:
+            # A class returning from idle must not bank credit from the time it was away
+            active = [s.vtime for s in self._classes.values() if s is not state and (s.waiters or s.running)]
+            if active:
+                state.vtime = max(state.vtime, min(active))
+            if self.running < self.capacity and state.can_run():
+                self._grant(state)
+                state.waits.append(0.0)
+                return 0.0
+
+        waiter = asyncio.get_running_loop().create_future()
+        state.waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just before the caller went away; hand the slot on
+                self._release(state)
+            else:
+                try:
+                    state.waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+        wait = time.perf_counter() - queued_at
+        state.waits.append(wait)
+        return wait
+
+    def release(self, name: str) -> None:
+        self._release(self._classes[name])
+
+    @asynccontextmanager
+    async def slot(self, name: str) -> AsyncIterator[float]:
+        """Hold an inference slot for class ``name``; yields the queue wait in seconds."""
+        wait = await self.acquire(name)
+        try:
+            yield wait
+        finally:
+            self.release(name)
+
+    def record(self, name: str, latency: float) -> None:
+        """Record the end-to-end latency of a request in class ``name``."""
+        state = self._classes[name]
+        state.served += 1
+        state.latencies.append(latency)
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "running": self.running,
+            "classes": {
+                name: {
+                    "weight": s.spec.weight,
+                    "max_concurrency": s.spec.max_concurrency,
+                    "queue_depth": len(s.waiters),
+                    "running": s.running,
+                    "served": s.served,
+                    "latency_p50": percentile(s.latencies, 50),
+                    "latency_p95": percentile(s.latencies, 95),
+                    "latency_p99": percentile(s.latencies, 99),
+                    "queue_wait_p95": percentile(s.waits, 95),
+                }
+                for name, s in self._classes.items()
+            },
+        }
@@ -0,0 +1,154 @@
+"""
+Preforked production server.
+
+The master process imports ``app`` (loading the U2Net session) once, binds the listening
+socket and then forks worker processes that serve from the shared socket. The model
+weights are inherited copy-on-write, so N workers cost roughly one model's worth of RAM
+instead of N. Workers are recycled after ``--max-requests`` requests to contain ONNX
+Runtime arena growth; the master replaces any worker that exits.
+
+Usage:
+    python serve.py --max-requests 500
+"""
+import argparse
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+
+logger = logging.getLogger("serve")
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Bind the listening socket in the master so every worker accepts from it."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Master:
+    """Forks, supervises and recycles worker processes."""
+
+    def __init__(self, app, sock: socket.socket, workers: int, max_requests: int, max_requests_jitter: int):
+        self.app = app
+        self.sock = sock
+        self.num_workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.workers: Dict[int, float] = {}  # pid -> start time
+        self.stopping = False
+
+    def spawn(self) -> None:
+        limit = self.max_requests
+        if limit and self.max_requests_jitter:
+            # Stagger recycling so workers don't all restart at once
+            limit += random.randint(0, self.max_requests_jitter)
+
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(limit)
+        self.workers[pid] = time.monotonic()
+        logger.info(f"Started worker {pid} (max requests: {limit or 'unlimited'})")
+
+    def _run_worker(self, limit: int) -> None:
+        import uvicorn
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        gc.enable()
+        code = 0
+        try:
+            config = uvicorn.Config(self.app, limit_max_requests=limit or None, log_level="info")
+            uvicorn.Server(config).run(sockets=[self.sock])
+        except Exception:
+            logger.exception("Worker crashed")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _handle_stop(self, signum, frame) -> None:
+        if self.stopping:
+            return
+        logger.info(f"Received signal {signum}, stopping workers...")
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        # Move everything loaded so far (including the model) out of the GC's reach so
+        # collections in the workers don't touch, and therefore copy, the shared pages
+        gc.freeze()
+        for _ in range(self.num_workers):
+            self.spawn()
+
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.workers.pop(pid, None)
+            if started is None:
+                continue
+            logger.info(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}")
+            if self.stopping:
+                continue
+            if time.monotonic() - started < 1.0:
+                # Avoid a tight fork loop if workers die on startup
+                time.sleep(1.0)
+            self.spawn()
+
+        logger.info("All workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the background remover with preforked workers')
+    parser.add_argument('--host', default='0.0.0.0', help='Bind address (default: 0.0.0.0)')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)),
+                        help='Port (default: $PORT or 8000)')
+    parser.add_argument('-w', '--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', 1)),
+                        help='Number of worker processes (default: $WEB_CONCURRENCY or 1)')
+    parser.add_argument('--max-requests', type=int, default=int(os.environ.get('MAX_REQUESTS', 500)),
+                        help='Recycle a worker after this many requests, 0 to disable (default: $MAX_REQUESTS or 500)')
+    parser.add_argument('--max-requests-jitter', type=int, default=int(os.environ.get('MAX_REQUESTS_JITTER', 50)),
+                        help='Random extra requests per worker before recycling (default: 50)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.workers > 1 and os.environ.get('INFERENCE_WORKERS'):
+        # Every web worker would start its own inference pool
+        parser.error('INFERENCE_WORKERS cannot be combined with more than one web worker')
+    if args.workers > 1:
+        logger.warning("Stored masks, scheduling caps, quality tiers and /metrics are per worker; "
+                       "/recomposite may return 404 when it reaches a different worker")
+
+    # ONNX Runtime thread pools don't survive fork; with one intra-op thread the session
+    # creates none, and parallelism comes from the worker processes instead
+    os.environ.setdefault('OMP_NUM_THREADS', '1')
+
+    # Keep the GC from touching objects between loading and forking
+    gc.disable()
+    from app import app
+
+    sock = bind_socket(args.host, args.port)
+    logger.info(f"Listening on {args.host}:{args.port} with {args.workers} workers")
+    Master(app, sock, args.workers, args.max_requests, args.max_requests_jitter).run()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
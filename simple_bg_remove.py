@@ -1,13 +1,31 @@
 import sys
 import subprocess
-import os
 from pathlib import Path
 
+from bg_daemon import remove_via_daemon
+
 def remove_background(input_path, output_path=None):
-    """Remove background using rembg CLI"""
+    """Remove background using the warm bg_daemon.py if running, else the rembg CLI"""
     if output_path is None:
         output_path = str(Path(input_path).with_stem(f"{Path(input_path).stem}_nobg"))
     
+    try:
+        result = remove_via_daemon(
+            Path(input_path).read_bytes(),
+            model="u2net",
+            alpha_matting=True,
+            alpha_matting_foreground_threshold=240,
+            alpha_matting_background_threshold=10,
+            alpha_matting_erode_size=10
+        )
+    except (OSError, RuntimeError) as e:
+        print(f"Error removing background: {e}")
+        return None
+    if result is not None:
+        Path(output_path).write_bytes(result)
+        print(f"Background removed successfully. Output saved to: {output_path}")
+        return output_path
+    
     cmd = [
         "rembg", "i", 
         "-m", "u2net",
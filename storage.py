@@ -0,0 +1,115 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+def write_atomic(path: Union[str, Path], data: bytes) -> None:
+    """Write ``data`` to ``path`` via a temporary file so readers never see partial output."""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+@dataclass
+class SweepResult:
+    removed_files: int = 0
+    reclaimed_bytes: int = 0
+    remaining_files: int = 0
+    remaining_bytes: int = 0
+
+
+class DiskJanitor:
+    """
+    Keeps generated files within a TTL and a disk quota.
+
+    Each sweep deletes files older than ``ttl`` seconds, then the oldest remaining files
+    until the directories together use at most ``max_bytes``.
+    """
+
+    def __init__(self, directories: Sequence[Union[str, Path]], ttl: float = 3600, max_bytes: int = 1024 * 1024 * 1024):
+        self.directories = [Path(d) for d in directories]
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.total_reclaimed_bytes = 0
+        self.total_removed_files = 0
+        self.last_sweep: Optional[SweepResult] = None
+        self._lock = threading.Lock()
+
+    def _files(self) -> List[Tuple[str, os.stat_result]]:
+        files = []
+        for directory in self.directories:
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory):
+                try:
+                    if entry.is_file():
+                        files.append((entry.path, entry.stat()))
+                except FileNotFoundError:
+                    pass
+        return files
+
+    def sweep(self) -> SweepResult:
+        """Run one cleanup pass and return what it reclaimed."""
+        with self._lock:
+            result = SweepResult()
+            cutoff = time.time() - self.ttl
+            kept = []
+            for path, stat in sorted(self._files(), key=lambda f: f[1].st_mtime):
+                if stat.st_mtime < cutoff and self._remove(path):
+                    result.removed_files += 1
+                    result.reclaimed_bytes += stat.st_size
+                else:
+                    kept.append((path, stat))
+
+            used = sum(stat.st_size for _, stat in kept)
+            while kept and used > self.max_bytes:
+                path, stat = kept.pop(0)
+                if self._remove(path):
+                    result.removed_files += 1
+                    result.reclaimed_bytes += stat.st_size
+                used -= stat.st_size
+
+            result.remaining_files = len(kept)
+            result.remaining_bytes = used
+            self.total_removed_files += result.removed_files
+            self.total_reclaimed_bytes += result.reclaimed_bytes
+            self.last_sweep = result
+
+        if result.removed_files:
+            logger.info(
+                f"Storage cleanup removed {result.removed_files} files, "
+                f"reclaimed {result.reclaimed_bytes / 1024:.1f}KB "
+                f"({result.remaining_bytes / 1024:.1f}KB in {result.remaining_files} files remain)"
+            )
+        return result
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def stats(self) -> dict:
+        last = self.last_sweep or SweepResult()
+        return {
+            "ttl": self.ttl,
+            "max_bytes": self.max_bytes,
+            "files": last.remaining_files,
+            "bytes": last.remaining_bytes,
+            "total_removed_files": self.total_removed_files,
+            "total_reclaimed_bytes": self.total_reclaimed_bytes,
+        }
@@ -0,0 +1,46 @@
+import io
+import json
+import tarfile
+
+from archive_stream import MANIFEST_NAME, default_output_name, process_archive
+
+
+def _tar(names):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        for name in names:
+            info = tarfile.TarInfo(name)
+            info.size = len(name)
+            archive.addfile(info, io.BytesIO(name.encode()))
+    buffer.seek(0)
+    return io.BufferedReader(buffer)
+
+
+def _run(names):
+    output = io.BytesIO()
+    manifest = process_archive(_tar(names), output, lambda data: data, workers=2)
+    output.seek(0)
+    with tarfile.open(fileobj=output) as archive:
+        members = {name: archive.extractfile(name).read() for name in archive.getnames()}
+    return manifest, members
+
+
+def test_default_output_name():
+    assert default_output_name("photos/a.jpg") == "photos/a_nobg.png"
+
+
+def test_results_and_manifest():
+    manifest, members = _run(["a.jpg", "notes.txt"])
+
+    assert members["a_nobg.png"] == b"a.jpg"
+    assert {entry["member"]: entry["status"] for entry in manifest} == {"a.jpg": "ok", "notes.txt": "skipped"}
+    assert [json.loads(line) for line in members[MANIFEST_NAME].splitlines()] == manifest
+
+
+def test_colliding_output_names_are_made_unique():
+    manifest, members = _run(["p/a.jpg", "p/a.png", "p/a.webp"])
+
+    outputs = {entry["member"]: entry["output"] for entry in manifest}
+    assert outputs == {"p/a.jpg": "p/a_nobg.png", "p/a.png": "p/a_nobg-2.png", "p/a.webp": "p/a_nobg-3.png"}
+    for member, output in outputs.items():
+        assert members[output] == member.encode()
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from compositing import composite, mask_bbox, parse_box, parse_color
+
+
+def test_parse_box_returns_pil_box():
+    assert parse_box("1,2,3,4") == (1, 2, 4, 6)
+    assert parse_box("0,0,10,10", (10, 10)) == (0, 0, 10, 10)
+
+
+@pytest.mark.parametrize("value", ["1,2,3", "1,2,3,4,5", "a,b,c,d", "0,0,0,5", "-1,0,5,5"])
+def test_parse_box_rejects_malformed(value):
+    with pytest.raises(ValueError, match="Invalid crop box"):
+        parse_box(value)
+
+
+def test_parse_box_rejects_boxes_outside_the_image():
+    with pytest.raises(ValueError, match="exceeds the 10x10 image"):
+        parse_box("5,5,40,40", (10, 10))
+
+
+def test_parse_color():
+    assert parse_color("#ff8000") == (255, 128, 0, 255)
+    assert parse_color("10,20,30,40") == (10, 20, 30, 40)
+    with pytest.raises(ValueError):
+        parse_color("#12345")
+
+
+def test_composite_crop_and_background():
+    image = Image.new("RGB", (10, 10), (0, 0, 255))
+    mask = Image.new("L", (10, 10), 0)
+    mask.paste(255, (2, 2, 6, 6))
+
+    output = composite(image, mask, bg_color=(255, 0, 0, 255), crop=(0, 0, 8, 8))
+    pixels = np.asarray(output)
+    assert output.size == (8, 8)
+    assert tuple(pixels[3, 3]) == (0, 0, 255, 255)
+    assert tuple(pixels[7, 7]) == (255, 0, 0, 255)
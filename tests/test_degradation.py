@@ -0,0 +1,63 @@
+from degradation import AdaptivePolicy, Tier, percentile
+
+TIERS = [Tier("full"), Tier("medium"), Tier("lite")]
+
+
+def make_policy(**kwargs):
+    options = dict(target_latency=1.0, min_samples=3, cooldown=0.0)
+    options.update(kwargs)
+    return AdaptivePolicy(TIERS, **options)
+
+
+def feed(policy, latency, queue_wait=0.0, count=3):
+    for _ in range(count):
+        policy.record(latency, queue_wait)
+
+
+def test_percentile():
+    assert percentile([], 95) == 0.0
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile(list(range(1, 101)), 95) == 95
+
+
+def test_steps_down_when_p95_exceeds_target():
+    policy = make_policy()
+    feed(policy, 2.0)
+    assert policy.current().name == "medium"
+    feed(policy, 2.0)
+    assert policy.current().name == "lite"
+    feed(policy, 2.0)
+    assert policy.current().name == "lite"
+
+
+def test_steps_down_on_queue_wait_alone():
+    policy = make_policy()
+    feed(policy, 0.8, queue_wait=0.6)
+    assert policy.current().name == "medium"
+
+
+def test_waits_for_min_samples():
+    policy = make_policy(min_samples=5)
+    feed(policy, 2.0, count=4)
+    assert policy.current().name == "full"
+
+
+def test_recovers_when_load_drops():
+    policy = make_policy()
+    feed(policy, 2.0)
+    feed(policy, 0.1)
+    assert policy.current().name == "full"
+
+
+def test_holds_tier_inside_the_hysteresis_band():
+    policy = make_policy()
+    feed(policy, 2.0)
+    feed(policy, 0.8)
+    assert policy.current().name == "medium"
+
+
+def test_cooldown_limits_changes():
+    policy = make_policy(cooldown=3600.0)
+    feed(policy, 2.0)
+    feed(policy, 2.0)
+    assert policy.current().name == "medium"
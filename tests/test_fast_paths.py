@@ -0,0 +1,64 @@
+from PIL import Image, ImageDraw
+
+from fast_paths import FastPathClassifier, existing_alpha, uniform_background
+
+
+def _photo(size=(200, 160)):
+    """Opaque image with enough texture that nothing about it is uniform."""
+    image = Image.linear_gradient("L").resize(size).convert("RGB")
+    ImageDraw.Draw(image).ellipse((40, 30, 150, 130), fill=(200, 40, 40))
+    return image
+
+
+def _on_transparent(photo, box, radius=0):
+    canvas = Image.new("RGBA", (box[2] + box[0], box[3] + box[1]), (0, 0, 0, 0))
+    alpha = Image.new("L", photo.size, 0)
+    ImageDraw.Draw(alpha).rounded_rectangle((0, 0, photo.width - 1, photo.height - 1), radius=radius, fill=255)
+    canvas.paste(photo, box[:2], alpha)
+    return canvas
+
+
+def test_existing_alpha_accepts_a_cutout():
+    cutout = Image.new("RGBA", (200, 160), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(cutout)
+    draw.ellipse((40, 20, 160, 140), fill=(200, 40, 40, 255))
+    draw.rectangle((90, 140, 110, 159), fill=(90, 60, 30, 255))
+
+    result = existing_alpha(cutout)
+    assert result is not None
+    assert result.kind == "alpha"
+    assert result.confidence >= 0.9
+
+
+def test_existing_alpha_rejects_a_letterboxed_photo():
+    assert existing_alpha(_on_transparent(_photo(), (0, 20, 200, 160))) is None
+
+
+def test_existing_alpha_rejects_rounded_corners():
+    assert existing_alpha(_on_transparent(_photo(), (10, 10, 200, 160), radius=20)) is None
+
+
+def test_existing_alpha_ignores_opaque_images():
+    assert existing_alpha(_photo().convert("RGBA")) is None
+    assert existing_alpha(_photo()) is None
+
+
+def test_uniform_background_separates_subject():
+    image = Image.new("RGB", (200, 160), (255, 255, 255))
+    ImageDraw.Draw(image).ellipse((50, 30, 150, 130), fill=(20, 60, 160))
+
+    result = uniform_background(image)
+    assert result is not None
+    assert result.confidence >= 0.9
+    assert result.mask.getpixel((100, 80)) == 255
+    assert result.mask.getpixel((5, 5)) == 0
+
+
+def test_uniform_background_rejects_busy_borders():
+    assert uniform_background(_photo()) is None
+
+
+def test_classifier_falls_back_to_the_model_for_padded_photos():
+    classifier = FastPathClassifier()
+    assert classifier.classify(_on_transparent(_photo(), (0, 20, 200, 160))) is None
+    assert classifier.stats()["misses"] == 1
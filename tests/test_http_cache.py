@@ -0,0 +1,85 @@
+import pytest
+from starlette.requests import Request
+
+from http_cache import cached_response, etag_matches, parse_range, request_etag
+
+
+def make_request(method="GET", **headers):
+    return Request({
+        "type": "http",
+        "method": method,
+        "path": "/",
+        "headers": [(name.replace("_", "-").lower().encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=90-", (90, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=-200", (0, 99)),
+    ("bytes=95-500", (95, 99)),
+    (" bytes=99-99 ", (99, 99)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=0-1,5-6", "items=0-9", "bytes=-", "bytes=a-b"])
+def test_parse_range_ignores_unsupported_forms(header):
+    assert parse_range(header, 100) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=150-200", "bytes=5-2", "bytes=-0"])
+def test_parse_range_rejects_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 100)
+
+
+def test_etag_matches():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+
+def test_request_etag_depends_on_upload_options_and_version():
+    base = request_etag(b"image", {"trim": False}, "v1")
+    assert base == request_etag(b"image", {"trim": False}, "v1")
+    assert base != request_etag(b"other", {"trim": False}, "v1")
+    assert base != request_etag(b"image", {"trim": True}, "v1")
+    assert base != request_etag(b"image", {"trim": False}, "v2")
+
+
+DATA = bytes(range(100))
+
+
+def test_cached_response_serves_ranges_on_get():
+    response = cached_response(make_request(range="bytes=10-19"), DATA, "image/png")
+    assert response.status_code == 206
+    assert response.body == DATA[10:20]
+    assert response.headers["content-range"] == "bytes 10-19/100"
+
+
+def test_cached_response_ignores_range_on_post():
+    response = cached_response(make_request("POST", range="bytes=0-9"), DATA, "image/png")
+    assert response.status_code == 200
+    assert response.body == DATA
+
+
+def test_cached_response_unsatisfiable_range():
+    response = cached_response(make_request(range="bytes=200-"), DATA, "image/png")
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */100"
+
+
+def test_cached_response_if_range_mismatch_sends_everything():
+    response = cached_response(make_request(range="bytes=0-9", if_range='"stale"'), DATA, "image/png", etag='"now"')
+    assert response.status_code == 200
+    assert response.body == DATA
+
+
+def test_cached_response_not_modified():
+    response = cached_response(make_request(if_none_match='"e"'), DATA, "image/png", etag='"e"')
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"e"'
@@ -0,0 +1,28 @@
+import numpy as np
+
+from compositing import mask_bbox
+
+
+def test_mask_bbox_of_empty_mask_is_none():
+    assert mask_bbox(np.zeros((5, 5), dtype=np.uint8)) is None
+
+
+def test_mask_bbox_is_exclusive_on_the_right_and_bottom():
+    mask = np.zeros((10, 20), dtype=np.uint8)
+    mask[2:5, 3:8] = 255
+    assert mask_bbox(mask) == (3, 2, 8, 5)
+
+
+def test_mask_bbox_padding_is_clamped_to_the_mask():
+    mask = np.zeros((10, 20), dtype=np.uint8)
+    mask[0, 19] = 1
+    mask[9, 0] = 1
+    assert mask_bbox(mask, padding=5) == (0, 0, 20, 10)
+
+
+def test_mask_bbox_threshold_ignores_faint_pixels():
+    mask = np.zeros((10, 10), dtype=np.uint8)
+    mask[1, 1] = 3
+    mask[4:6, 4:6] = 200
+    assert mask_bbox(mask) == (1, 1, 6, 6)
+    assert mask_bbox(mask, threshold=10) == (4, 4, 6, 6)
@@ -0,0 +1,114 @@
+import io
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from near_duplicates import NearDuplicateIndex, hamming, phash
+
+
+def scene(seed, size=(640, 480)):
+    rng = np.random.default_rng(seed)
+    image = Image.new("RGB", size, tuple(int(v) for v in rng.integers(0, 255, 3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(6):
+        x, y = rng.integers(0, size[0] - 40), rng.integers(0, size[1] - 40)
+        w, h = rng.integers(40, 200, 2)
+        draw.ellipse([x, y, x + w, y + h], fill=tuple(int(v) for v in rng.integers(0, 255, 3)))
+    return image
+
+
+def recompress(image, size, quality=60):
+    buffer = io.BytesIO()
+    image.resize(size).save(buffer, "JPEG", quality=quality)
+    return Image.open(io.BytesIO(buffer.getvalue()))
+
+
+def rectangle_mask(size, box):
+    mask = Image.new("L", size, 0)
+    ImageDraw.Draw(mask).rectangle(box, fill=255)
+    return mask
+
+
+def test_hamming():
+    assert hamming(0b1011, 0b0001) == 2
+    assert hamming(5, 5) == 0
+
+
+def test_phash_is_stable_under_resizing_and_recompression():
+    image = scene(1)
+    assert hamming(phash(image), phash(recompress(image, (320, 240)))) <= 6
+    assert hamming(phash(image), phash(scene(2))) > 6
+
+
+def test_near_duplicate_gets_the_rescaled_mask():
+    index = NearDuplicateIndex()
+    image = scene(1)
+    index.add(image, rectangle_mask(image.size, (100, 50, 299, 199)))
+
+    reused = index.lookup(recompress(image, (320, 240)), b"other upload")
+    assert reused is not None and not reused.exact
+    assert reused.mask.size == (320, 240)
+    assert reused.mask.getbbox() == (49, 24, 151, 101)
+    assert index.stats()["hits"] == 1
+
+
+def test_byte_identical_upload_matches_exactly():
+    index = NearDuplicateIndex()
+    image = scene(1)
+    index.add(image, rectangle_mask(image.size, (100, 50, 299, 199)), b"upload")
+
+    reused = index.lookup(image, b"upload")
+    assert reused is not None and reused.exact
+    assert reused.mask.getbbox() == (100, 50, 300, 200)
+    stats = index.stats()
+    assert stats["exact_hits"] == 1 and stats["hits"] == 0
+
+
+def test_re_adding_an_upload_replaces_its_entry():
+    index = NearDuplicateIndex()
+    image = scene(1)
+    index.add(image, rectangle_mask(image.size, (0, 0, 10, 10)), b"upload")
+    index.add(image, rectangle_mask(image.size, (0, 0, 20, 20)), b"upload")
+
+    assert index.stats()["entries"] == 1
+    assert index.lookup(image, b"upload").mask.getbbox() == (0, 0, 21, 21)
+
+
+def test_different_images_and_crops_miss():
+    index = NearDuplicateIndex()
+    image = scene(1)
+    index.add(image, rectangle_mask(image.size, (0, 0, 10, 10)))
+
+    assert index.lookup(scene(3)) is None
+    assert index.lookup(image.crop((0, 0, 600, 450))) is None
+    stats = index.stats()
+    assert stats["hits"] == 0 and stats["misses"] == 2 and stats["hit_rate"] == 0.0
+
+
+def test_aspect_ratio_must_match():
+    index = NearDuplicateIndex(max_distance=64, verify=False)
+    image = scene(1)
+    index.add(image, rectangle_mask(image.size, (0, 0, 10, 10)))
+    assert index.lookup(image.resize((640, 240))) is None
+    assert index.stats()["rejected"] == 1
+
+
+def test_index_evicts_least_recently_used():
+    index = NearDuplicateIndex(max_entries=2)
+    images = [scene(seed) for seed in (1, 2, 3)]
+    for image in images[:2]:
+        index.add(image, rectangle_mask(image.size, (0, 0, 10, 10)))
+    assert index.lookup(images[0]) is not None  # refreshes the first entry
+    index.add(images[2], rectangle_mask(images[2].size, (0, 0, 10, 10)))
+
+    assert index.stats()["entries"] == 2
+    assert index.lookup(images[0]) is not None
+    assert index.lookup(images[1]) is None
+
+
+def test_disabled_index_is_a_no_op():
+    index = NearDuplicateIndex(enabled=False)
+    image = scene(1)
+    index.add(image, rectangle_mask(image.size, (0, 0, 10, 10)))
+    assert index.lookup(image) is None
+    assert index.stats()["entries"] == 0
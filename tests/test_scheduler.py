@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from scheduler import FairScheduler, RequestClass
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def grant_order(scheduler, holder, names, grants):
+    """Queue a waiter per name behind ``holder`` and return the order slots are granted in."""
+    await scheduler.acquire(holder)
+    order = []
+
+    async def waiter(name, index):
+        await scheduler.acquire(name)
+        order.append((name, index))
+
+    tasks = [asyncio.ensure_future(waiter(name, i)) for i, name in enumerate(names)]
+    await asyncio.sleep(0)
+    current = holder
+    for _ in range(grants):
+        scheduler.release(current)
+        await asyncio.sleep(0)
+        current = order[-1][0]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return order
+
+
+def test_slots_are_shared_in_proportion_to_weight():
+    scheduler = FairScheduler(1, [RequestClass("interactive", weight=3), RequestClass("bulk", weight=1)])
+    order = run(grant_order(scheduler, "interactive", ["interactive", "bulk"] * 20, grants=20))
+
+    served = [name for name, _ in order]
+    assert served.count("interactive") == pytest.approx(15, abs=1)
+    assert served.count("bulk") == pytest.approx(5, abs=1)
+
+
+def test_each_class_is_served_in_arrival_order():
+    scheduler = FairScheduler(1, [RequestClass("interactive", weight=2), RequestClass("bulk", weight=1)])
+    order = run(grant_order(scheduler, "bulk", ["interactive", "bulk"] * 5, grants=10))
+
+    for name in ("interactive", "bulk"):
+        indexes = [i for served, i in order if served == name]
+        assert indexes == sorted(indexes)
+
+
+def test_idle_class_uses_every_slot_it_is_allowed():
+    async def scenario():
+        scheduler = FairScheduler(3, [RequestClass("interactive"), RequestClass("bulk", max_concurrency=2)])
+        assert await scheduler.acquire("bulk") == 0.0
+        assert await scheduler.acquire("bulk") == 0.0
+        capped = asyncio.ensure_future(scheduler.acquire("bulk"))
+        await asyncio.sleep(0)
+        assert not capped.done()
+        # The free slot is still available to interactive traffic
+        assert await scheduler.acquire("interactive") == 0.0
+        capped.cancel()
+        await asyncio.gather(capped, return_exceptions=True)
+        return scheduler.stats()
+
+    stats = run(scenario())
+    assert stats["running"] == 3
+    assert stats["classes"]["bulk"]["queue_depth"] == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = FairScheduler(1, [RequestClass("interactive")])
+        await scheduler.acquire("interactive")
+        queued = asyncio.ensure_future(scheduler.acquire("interactive"))
+        await asyncio.sleep(0)
+        assert scheduler.stats()["classes"]["interactive"]["queue_depth"] == 1
+
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        assert scheduler.stats()["classes"]["interactive"]["queue_depth"] == 0
+
+        scheduler.release("interactive")
+        assert scheduler.running == 0
+        assert await scheduler.acquire("interactive") == 0.0
+
+    run(scenario())
+
+
+def test_slot_granted_to_a_cancelled_waiter_is_handed_on():
+    async def scenario():
+        scheduler = FairScheduler(1, [RequestClass("interactive")])
+        await scheduler.acquire("interactive")
+        first = asyncio.ensure_future(scheduler.acquire("interactive"))
+        second = asyncio.ensure_future(scheduler.acquire("interactive"))
+        await asyncio.sleep(0)
+
+        # The slot goes to ``first``, which is cancelled before it gets to run
+        scheduler.release("interactive")
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        assert first.cancelled()
+        assert second.done() and not second.cancelled()
+        assert scheduler.running == 1
+
+    run(scenario())
+
+
+def test_slot_context_manager_releases_on_error():
+    async def scenario():
+        scheduler = FairScheduler(1, [RequestClass("interactive")])
+        with pytest.raises(RuntimeError):
+            async with scheduler.slot("interactive"):
+                raise RuntimeError("inference failed")
+        return scheduler.running
+
+    assert run(scenario()) == 0
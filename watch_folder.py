@@ -0,0 +1,309 @@
+"""
+Watch-folder daemon: keep the model warm and process images as they land in a directory.
+
+New or changed files are picked up through inotify on Linux (polling elsewhere, or with
+--poll), processed once their size and mtime have been stable for --settle seconds, and
+written atomically to the output directory. Inputs are then moved to done/ or failed/.
+SIGINT/SIGTERM stop intake and drain the images already in flight.
+
+Usage:
+    python watch_folder.py incoming/ -o processed/ --workers 2
+"""
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import signal
+import struct
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple, Union
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+
+# inotify(7) event flags
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """
+    Reports paths created, written or moved into a directory, via inotify.
+
+    If the kernel's event queue overflows, events were lost, so every file in the
+    directory is reported instead.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f'inotify_add_watch failed for {directory}')
+
+    def wait(self, timeout: float) -> Set[Path]:
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            _, event_mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b'\0')
+            offset += name_len
+            if event_mask & IN_Q_OVERFLOW:
+                print(f"inotify queue overflowed, rescanning {self.directory}")
+                changed.update(Path(entry.path) for entry in os.scandir(self.directory) if entry.is_file())
+            elif name:
+                changed.add(self.directory / os.fsdecode(name))
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback watcher that rescans the directory and reports changed entries."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._seen: Dict[Path, Tuple[int, int]] = {}
+
+    def wait(self, timeout: float) -> Set[Path]:
+        time.sleep(timeout)
+        current = {}
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                stat = entry.stat()
+                current[Path(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+        changed = {path for path, sig in current.items() if self._seen.get(path) != sig}
+        self._seen = current
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+def make_watcher(directory: Path, force_polling: bool = False):
+    """Use inotify where available, polling otherwise."""
+    if not force_polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directory)
+        except OSError as e:
+            print(f"inotify unavailable ({e}), falling back to polling")
+    return PollingWatcher(directory)
+
+
+class WatchFolderDaemon:
+    """Processes images dropped into ``input_dir`` with a warm BackgroundRemover."""
+
+    def __init__(
+        self,
+        remover,
+        input_dir: Union[str, Path],
+        output_dir: Union[str, Path],
+        done_dir: Optional[Union[str, Path]] = None,
+        failed_dir: Optional[Union[str, Path]] = None,
+        workers: int = 2,
+        settle: float = 1.0,
+        poll_interval: float = 1.0,
+        force_polling: bool = False,
+        **kwargs
+    ):
+        """
+        Args:
+            remover: BackgroundRemover used for every image
+            input_dir: Directory to watch
+            output_dir: Directory for processed images
+            done_dir: Where processed inputs are moved (default: input_dir/done)
+            failed_dir: Where inputs that failed are moved (default: input_dir/failed)
+            workers: Maximum number of images processed at once
+            settle: Seconds a file's size and mtime must be unchanged before processing
+            poll_interval: Seconds between checks (and directory scans when polling)
+            force_polling: Use polling even where inotify is available
+            **kwargs: Additional arguments to pass to remove_background
+        """
+        self.remover = remover
+        self.input_dir = Path(input_dir)
+        self.output_dir = Path(output_dir)
+        self.done_dir = Path(done_dir) if done_dir else self.input_dir / 'done'
+        self.failed_dir = Path(failed_dir) if failed_dir else self.input_dir / 'failed'
+        self.workers = workers
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.force_polling = force_polling
+        self.options = kwargs
+
+        self._pending: Dict[Path, Tuple[Tuple[int, int], float]] = {}
+        self._in_flight: Dict[Path, Future] = {}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+
+    def _is_candidate(self, path: Path) -> bool:
+        return (
+            path.parent == self.input_dir
+            and not path.name.startswith('.')
+            and path.suffix.lower() in IMAGE_EXTENSIONS
+        )
+
+    def _track(self, paths: Set[Path]) -> None:
+        now = time.monotonic()
+        for path in paths:
+            if self._is_candidate(path) and path not in self._in_flight:
+                # Any event restarts the settle timer
+                self._pending[path] = ((-1, -1), now)
+
+    def _stable_files(self) -> Set[Path]:
+        """Return pending files whose size and mtime have not changed for ``settle`` seconds."""
+        now = time.monotonic()
+        stable = set()
+        for path, (last_sig, since) in list(self._pending.items()):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                del self._pending[path]
+                continue
+            sig = (stat.st_size, stat.st_mtime_ns)
+            if sig != last_sig:
+                self._pending[path] = (sig, now)
+            elif now - since >= self.settle and stat.st_size > 0:
+                stable.add(path)
+        return stable
+
+    @staticmethod
+    def _move(path: Path, directory: Path) -> None:
+        target = directory / path.name
+        if target.exists():
+            target = directory / f"{path.stem}_{time.time_ns()}{path.suffix}"
+        os.replace(path, target)
+
+    def _process(self, path: Path) -> None:
+        output_path = self.output_dir / f"{path.stem}_nobg.png"
+        tmp_path = self.output_dir / f".{output_path.name}.{uuid.uuid4().hex}.tmp"
+        try:
+            self.remover.remove_background(str(path), str(tmp_path), **self.options)
+            os.replace(tmp_path, output_path)
+            self._move(path, self.done_dir)
+            with self._lock:
+                self.processed += 1
+        except Exception as e:
+            print(f"Error processing {path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            with self._lock:
+                self.failed += 1
+            if path.exists():
+                self._move(path, self.failed_dir)
+
+    def _submit_ready(self, executor: ThreadPoolExecutor) -> None:
+        for path, future in list(self._in_flight.items()):
+            if future.done():
+                del self._in_flight[path]
+
+        for path in sorted(self._stable_files(), key=lambda p: self._pending[p][1]):
+            if len(self._in_flight) >= self.workers:
+                break
+            del self._pending[path]
+            self._in_flight[path] = executor.submit(self._process, path)
+
+    def stop(self, *args) -> None:
+        """Stop picking up new files; images already in flight are finished."""
+        self._stop.set()
+
+    def run(self) -> None:
+        for directory in (self.output_dir, self.done_dir, self.failed_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        watcher = make_watcher(self.input_dir, self.force_polling)
+        print(f"Watching {self.input_dir} with {type(watcher).__name__} ({self.workers} workers)")
+
+        # Pick up anything that arrived while the daemon was down
+        self._track({Path(entry.path) for entry in os.scandir(self.input_dir) if entry.is_file()})
+
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            while not self._stop.is_set():
+                self._track(watcher.wait(self.poll_interval if not self._pending else min(self.poll_interval, self.settle / 2)))
+                self._submit_ready(executor)
+        finally:
+            print(f"Shutting down, waiting for {len(self._in_flight)} image(s) in flight...")
+            executor.shutdown(wait=True)
+            watcher.close()
+            print(f"Stopped. {self.processed} images processed, {self.failed} failed.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Watch a directory and remove backgrounds from new images')
+    parser.add_argument('input', help='Directory to watch')
+    parser.add_argument('-o', '--output', help='Output directory (default: <input>_nobg)')
+    parser.add_argument('--done', help='Directory for processed inputs (default: <input>/done)')
+    parser.add_argument('--failed', help='Directory for failed inputs (default: <input>/failed)')
+    parser.add_argument('--model', default='u2net', help='Model to use (default: u2net)')
+    parser.add_argument('-w', '--workers', type=int, default=2, help='Images processed at once (default: 2)')
+    parser.add_argument('--settle', type=float, default=1.0,
+                        help='Seconds a file must be unchanged before processing (default: 1.0)')
+    parser.add_argument('--poll', action='store_true', help='Poll the directory instead of using inotify')
+    parser.add_argument('--no-alpha-matting', dest='alpha_matting', action='store_false', default=True,
+                        help='Disable alpha matting')
+    parser.add_argument('--no-post-process', dest='post_process', action='store_false', default=True,
+                        help='Disable all post-processing')
+    args = parser.parse_args()
+
+    from bg_daemon import daemon_available, default_socket_path
+    from bg_remover import BackgroundRemover
+
+    input_dir = Path(args.input)
+    if not input_dir.is_dir():
+        print(f"Error: {args.input} is not a directory")
+        sys.exit(1)
+
+    remover = BackgroundRemover(model_name=args.model)
+    if daemon_available():
+        print(f"Using the warm daemon at {default_socket_path()}")
+    else:
+        # The remover loads lazily; load now so the first dropped file doesn't wait for it
+        start_time = time.time()
+        print("Loading model...")
+        remover.session
+        print(f"Model loaded in {time.time() - start_time:.2f} seconds")
+
+    daemon = WatchFolderDaemon(
+        remover,
+        input_dir,
+        args.output or f"{str(input_dir).rstrip('/')}_nobg",
+        done_dir=args.done,
+        failed_dir=args.failed,
+        workers=args.workers,
+        settle=args.settle,
+        force_polling=args.poll,
+        alpha_matting=args.alpha_matting,
+        post_process=args.post_process
+    )
+    daemon.run()
+
+
+if __name__ == "__main__":
+    main()